@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+
+from datetime import date, timedelta
+from sqlalchemy import exists, insert
+from sqlalchemy.orm import Session, contains_eager, joinedload
+from starlette.concurrency import run_in_threadpool
+from database import SessionLocal, Booking, Slot, BookingArchive, SlotArchive
+import asyncio
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+ARCHIVE_BATCH_SIZE = int(os.getenv("ARCHIVE_BATCH_SIZE", 500))
+# Seconds between background runs; 0 disables the background task
+ARCHIVE_INTERVAL_SECONDS = int(os.getenv("ARCHIVE_INTERVAL_SECONDS", 3600))
+# Slots dated more than this many days ago count as expired
+ARCHIVE_AFTER_DAYS = int(os.getenv("ARCHIVE_AFTER_DAYS", 1))
+
+def archive_cutoff() -> str:
+    return (date.today() - timedelta(days=ARCHIVE_AFTER_DAYS)).isoformat()
+
+def archive_bookings_batch(db: Session, cutoff: str, batch_size: int = ARCHIVE_BATCH_SIZE) -> int:
+    """Move one batch of cancelled or completed bookings to bookings_archive."""
+    bookings = (
+        db.query(Booking)
+        .join(Booking.slot)
+        .options(contains_eager(Booking.slot).joinedload(Slot.hospital))
+        .filter((Booking.status == "cancelled") | (Slot.date < cutoff))
+        # A reused id (SQLite tables created without AUTOINCREMENT) stays put
+        # rather than failing every batch on the archive's primary key
+        .filter(~exists().where(BookingArchive.id == Booking.id))
+        .order_by(Booking.id)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True, of=Booking)
+        .all()
+    )
+    if not bookings:
+        return 0
+
+    db.execute(insert(BookingArchive), [
+        {
+            "id": booking.id,
+            "user_id": booking.user_id,
+            "slot_id": booking.slot_id,
+            "status": booking.status,
+            "booking_date": booking.booking_date,
+            "doctor_name": booking.slot.doctor_name,
+            "specialty": booking.slot.specialty,
+            "slot_date": booking.slot.date,
+            "slot_time": booking.slot.time,
+            "price": booking.slot.price,
+            "hospital_name": booking.slot.hospital.name
+        }
+        for booking in bookings
+    ])
+    db.query(Booking).filter(Booking.id.in_([b.id for b in bookings])).delete(synchronize_session=False)
+    db.commit()
+    return len(bookings)
+
+def archive_slots_batch(db: Session, cutoff: str, batch_size: int = ARCHIVE_BATCH_SIZE) -> int:
+    """Move one batch of expired slots that no live booking refers to."""
+    slots = (
+        db.query(Slot)
+        .filter(Slot.date < cutoff, ~Slot.bookings.any())
+        .filter(~exists().where(SlotArchive.id == Slot.id))
+        .order_by(Slot.id)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+        .all()
+    )
+    if not slots:
+        return 0
+
+    db.execute(insert(SlotArchive), [
+        {
+            "id": slot.id,
+            "hospital_id": slot.hospital_id,
+            "schedule_id": slot.schedule_id,
+            "doctor_name": slot.doctor_name,
+            "specialty": slot.specialty,
+            "date": slot.date,
+            "time": slot.time,
+            "price": slot.price,
+            "is_available": slot.is_available
+        }
+        for slot in slots
+    ])
+    db.query(Slot).filter(Slot.id.in_([s.id for s in slots])).delete(synchronize_session=False)
+    db.commit()
+    return len(slots)
+
+def run_archival(batch_size: int = ARCHIVE_BATCH_SIZE):
+    """Archive everything that is due, one committed batch at a time."""
+    cutoff = archive_cutoff()
+    db = SessionLocal()
+    try:
+        bookings = slots = 0
+        # Bookings first, so their slots are no longer referenced
+        while True:
+            moved = archive_bookings_batch(db, cutoff, batch_size)
+            bookings += moved
+            if moved < batch_size:
+                break
+        while True:
+            moved = archive_slots_batch(db, cutoff, batch_size)
+            slots += moved
+            if moved < batch_size:
+                break
+        return {"bookings": bookings, "slots": slots}
+    finally:
+        db.close()
+
+async def archive_periodically():
+    while True:
+        await asyncio.sleep(ARCHIVE_INTERVAL_SECONDS)
+        try:
+            counts = await run_in_threadpool(run_archival)
+            if counts["bookings"] or counts["slots"]:
+                print(f"Archived {counts['bookings']} bookings and {counts['slots']} slots")
+        except Exception as e:
+            print(f"Archival run failed: {e}")
+
+def _booking_dict(booking: Booking):
+    return {
+        "id": booking.id,
+        "slot_id": booking.slot_id,
+        "status": booking.status,
+        "booking_date": booking.booking_date,
+        "slot": {
+            "doctor_name": booking.slot.doctor_name,
+            "specialty": booking.slot.specialty,
+            "date": booking.slot.date,
+            "time": booking.slot.time,
+            "price": booking.slot.price,
+            "hospital_name": booking.slot.hospital.name
+        }
+    }
+
+def _archived_booking_dict(booking: BookingArchive):
+    return {
+        "id": booking.id,
+        "slot_id": booking.slot_id,
+        "status": booking.status,
+        "booking_date": booking.booking_date,
+        "slot": {
+            "doctor_name": booking.doctor_name,
+            "specialty": booking.specialty,
+            "date": booking.slot_date,
+            "time": booking.slot_time,
+            "price": booking.price,
+            "hospital_name": booking.hospital_name
+        }
+    }
+
+def get_booking_history(db: Session, user_id: int, limit=None, offset: int = 0):
+    """A user's bookings from the hot and archive tables, newest first."""
+    hot = (
+        db.query(Booking)
+        .options(joinedload(Booking.slot).joinedload(Slot.hospital))
+        .filter(Booking.user_id == user_id)
+        .order_by(Booking.booking_date.desc(), Booking.id.desc())
+    )
+    archived = (
+        db.query(BookingArchive)
+        .filter(BookingArchive.user_id == user_id)
+        .order_by(BookingArchive.booking_date.desc(), BookingArchive.id.desc())
+    )
+    if limit is not None:
+        # Either table may supply the whole page
+        hot = hot.limit(offset + limit)
+        archived = archived.limit(offset + limit)
+
+    result = [_booking_dict(b) for b in hot.all()] + [_archived_booking_dict(b) for b in archived.all()]
+    result.sort(key=lambda b: (b["booking_date"], b["id"]), reverse=True)
+    end = offset + limit if limit is not None else None
+    return result[offset:end]
+
+if __name__ == "__main__":
+    counts = run_archival()
+    print(f"Archived {counts['bookings']} bookings and {counts['slots']} slots")
@@ -5,7 +5,7 @@ from passlib.context import CryptContext
 from fastapi import HTTPException, status, Depends
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.orm import Session
-from database import get_db, User
+from database import SessionLocal, engine, get_db, get_read_db, User
 import os
 from dotenv import load_dotenv
 
@@ -60,3 +60,20 @@ def get_current_user(username: str = Depends(verify_token), db: Session = Depend
             detail="User not found"
         )
     return user
+
+def get_current_user_for_read(username: str = Depends(verify_token), db: Session = Depends(get_read_db)):
+    """get_current_user on the read session, so read endpoints hold a single connection."""
+    user = db.query(User).filter(User.username == username).first()
+    if user is None and db.get_bind() is not engine:
+        # The replica may not have caught up with a fresh signup yet
+        primary = SessionLocal()
+        try:
+            user = primary.query(User).filter(User.username == username).first()
+        finally:
+            primary.close()
+    if user is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="User not found"
+        )
+    return user
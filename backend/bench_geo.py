@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+
+import sys
+import time
+import numpy as np
+from geo import GridIndex, haversine_km
+
+# Rough bounding box of India
+LAT_RANGE = (8.0, 34.0)
+LON_RANGE = (68.0, 97.0)
+
+def benchmark_geo(count: int = 100_000, queries: int = 500, radius_km: float = 25):
+    rng = np.random.default_rng(7)
+    ids = np.arange(count)
+    lats = rng.uniform(*LAT_RANGE, count)
+    lons = rng.uniform(*LON_RANGE, count)
+
+    start = time.perf_counter()
+    index = GridIndex(ids, lats, lons)
+    print(f"✓ Built grid index of {count} hospitals in {(time.perf_counter() - start) * 1000:.0f} ms")
+
+    points = zip(rng.uniform(*LAT_RANGE, queries), rng.uniform(*LON_RANGE, queries))
+    grid, brute, found = [], [], 0
+    for lat, lon in points:
+        start = time.perf_counter()
+        found += len(index.query(lat, lon, radius_km, limit=200))
+        grid.append((time.perf_counter() - start) * 1000)
+
+        start = time.perf_counter()
+        distances = haversine_km(lat, lon, lats, lons)
+        nearest = np.flatnonzero(distances <= radius_km)
+        nearest = nearest[np.argsort(distances[nearest])][:200]
+        brute.append((time.perf_counter() - start) * 1000)
+
+    print(f"✓ {radius_km:g} km radius query, {found / queries:.1f} hospitals on average")
+    print(f"  grid index:  p50 {np.percentile(grid, 50):.3f} ms, p95 {np.percentile(grid, 95):.3f} ms")
+    print(f"  full scan:   p50 {np.percentile(brute, 50):.3f} ms, p95 {np.percentile(brute, 95):.3f} ms")
+
+if __name__ == "__main__":
+    benchmark_geo(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+
+import os
+import random
+import sys
+import tempfile
+import time
+import numpy as np
+from retrieval import HashingEmbedder, ContentIndex
+
+WORDS = (
+    "vata pitta kapha turmeric ginger ghee rice kitchari mung dal cumin coriander fennel "
+    "cardamom cinnamon almond milk coconut cucumber mint honey sesame oil warm cooling light "
+    "grounding digestion sleep stress anxiety energy detox breakfast lunch dinner tea soup"
+).split()
+
+def synthetic_items(count: int, seed: int = 7):
+    rng = random.Random(seed)
+    doshas = ["vata", "pitta", "kapha", "all"]
+    for i in range(count):
+        text = " ".join(rng.choice(WORDS) for _ in range(24))
+        yield {"key": f"recipe:{i}", "dosha": doshas[i % 4], "title": f"Recipe {i}", "text": text}
+
+def benchmark_retrieval(count: int = 100_000, queries: int = 200):
+    path = os.path.join(tempfile.mkdtemp(), "bench_index.npy")
+    index = ContentIndex(path, HashingEmbedder())
+
+    start = time.perf_counter()
+    index.sync(list(synthetic_items(count)))
+    print(f"✓ Built index of {count} items in {time.perf_counter() - start:.1f}s")
+
+    start = time.perf_counter()
+    reopened = ContentIndex(path, HashingEmbedder())
+    print(f"✓ Reopened memory-mapped index in {(time.perf_counter() - start) * 1000:.0f} ms")
+
+    rng = random.Random(11)
+    timings = []
+    for _ in range(queries):
+        query = " ".join(rng.choice(WORDS) for _ in range(6))
+        start = time.perf_counter()
+        reopened.search(query, k=3, dosha=rng.choice(["vata", "pitta", "kapha"]))
+        timings.append((time.perf_counter() - start) * 1000)
+    print(f"✓ Top-3 search over {count} items: p50 {np.percentile(timings, 50):.2f} ms, "
+          f"p95 {np.percentile(timings, 95):.2f} ms")
+
+if __name__ == "__main__":
+    benchmark_retrieval(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
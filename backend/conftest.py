@@ -0,0 +1,16 @@
+import os
+import tempfile
+
+# database.py binds its engine at import time, so point it at a throwaway
+# database before any test module imports it. TEST_DATABASE_URL overrides
+# this, e.g. to run the suite against a local Postgres.
+_tmp_dir = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = os.getenv(
+    "TEST_DATABASE_URL",
+    f"sqlite:///{os.path.join(_tmp_dir, 'test.db')}"
+)
+os.environ.pop("READ_DATABASE_URL", None)
+os.environ.setdefault("JWT_SECRET_KEY", "test-secret")
+os.environ.setdefault("JWT_ALGORITHM", "HS256")
+os.environ["RETRIEVAL_INDEX_PATH"] = os.path.join(_tmp_dir, "content_index.npy")
+os.environ["RETRIEVAL_EMBEDDER"] = "hashing"
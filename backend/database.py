@@ -1,17 +1,51 @@
-from sqlalchemy import create_engine, Column, Integer, String, Float, DateTime, Boolean, Text, ForeignKey
+from sqlalchemy import create_engine, event, inspect, text, Column, Integer, String, Float, DateTime, Boolean, Text, ForeignKey, Index
+from sqlalchemy.exc import OperationalError, ProgrammingError, TimeoutError as PoolTimeoutError
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, Session, relationship
 from sqlalchemy.sql import func
+from fastapi import Request
 import os
+import time
 from dotenv import load_dotenv
 
 load_dotenv()
 
 DATABASE_URL = os.getenv("DATABASE_URL")
+# Optional read replica; when unset every session goes to the primary
+READ_DATABASE_URL = os.getenv("READ_DATABASE_URL")
+# How long a client keeps reading from the primary after its own write
+READ_STICKY_SECONDS = float(os.getenv("READ_STICKY_SECONDS", 5))
+# How long an unreachable replica is skipped before it is tried again
+READ_RETRY_SECONDS = float(os.getenv("READ_RETRY_SECONDS", 30))
+# How long a request waits for a pooled connection before failing with 503
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", 5))
+# Half-life of the pool wait average used for load shedding
+POOL_WAIT_HALF_LIFE_SECONDS = 5.0
 
-engine = create_engine(DATABASE_URL, echo=False)
+def _engine_kwargs(url):
+    # SQLite connections are handed between FastAPI's worker threads
+    if url and url.startswith("sqlite"):
+        return {"connect_args": {"check_same_thread": False}}
+    return {"pool_timeout": DB_POOL_TIMEOUT}
+
+engine = create_engine(DATABASE_URL, echo=False, **_engine_kwargs(DATABASE_URL))
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+if READ_DATABASE_URL:
+    read_engine = create_engine(
+        READ_DATABASE_URL, echo=False, pool_pre_ping=True, **_engine_kwargs(READ_DATABASE_URL)
+    )
+    ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
+else:
+    read_engine = None
+    ReadSessionLocal = None
+
+# sticky key -> monotonic time of the client's last committed write
+_recent_writes = {}
+_replica_down_until = 0.0
+# Decaying average of connection checkout wait: [seconds, monotonic time of last sample]
+_pool_wait = [0.0, 0.0]
+
 Base = declarative_base()
 
 class User(Base):
@@ -33,38 +67,110 @@ class Hospital(Base):
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String(200), index=True)
     location = Column(String(200))
+    latitude = Column(Float, nullable=True)
+    longitude = Column(Float, nullable=True)
     specialties = Column(Text)  # JSON string of specialties
     rating = Column(Float, default=4.0)
     
     slots = relationship("Slot", back_populates="hospital")
+    schedules = relationship("DoctorSchedule", back_populates="hospital")
+
+class DoctorSchedule(Base):
+    __tablename__ = "doctor_schedules"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    hospital_id = Column(Integer, ForeignKey("hospitals.id"), index=True)
+    doctor_name = Column(String(100))
+    specialty = Column(String(100))
+    weekly_pattern = Column(Text)  # JSON: {"mon": ["09:00", "11:00"], "thu": ["14:00"]}
+    price = Column(Float)
+    valid_from = Column(String(20), nullable=True)  # YYYY-MM-DD format
+    valid_until = Column(String(20), nullable=True)  # YYYY-MM-DD format
+    is_active = Column(Boolean, default=True)
+    
+    hospital = relationship("Hospital", back_populates="schedules")
+    slots = relationship("Slot", back_populates="schedule")
 
 class Slot(Base):
     __tablename__ = "slots"
+    # Schedule slots are only persisted once booked or overridden. Ids are never
+    # reused on SQLite either, since archived slots keep theirs.
+    __table_args__ = (
+        Index("uq_slots_schedule_occurrence", "schedule_id", "date", "time", unique=True),
+        {"sqlite_autoincrement": True}
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     hospital_id = Column(Integer, ForeignKey("hospitals.id"))
+    schedule_id = Column(Integer, ForeignKey("doctor_schedules.id"), nullable=True, index=True)
     doctor_name = Column(String(100))
     specialty = Column(String(100))
-    date = Column(String(20))  # YYYY-MM-DD format
+    date = Column(String(20), index=True)  # YYYY-MM-DD format
     time = Column(String(10))  # HH:MM format
     price = Column(Float)
     is_available = Column(Boolean, default=True)
     
     hospital = relationship("Hospital", back_populates="slots")
+    schedule = relationship("DoctorSchedule", back_populates="slots")
     bookings = relationship("Booking", back_populates="slot")
 
 class Booking(Base):
     __tablename__ = "bookings"
+    # Archived bookings keep their ids, so SQLite must not hand them out again
+    __table_args__ = {"sqlite_autoincrement": True}
     
     id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, ForeignKey("users.id"))
-    slot_id = Column(Integer, ForeignKey("slots.id"))
+    user_id = Column(Integer, ForeignKey("users.id"), index=True)
+    slot_id = Column(Integer, ForeignKey("slots.id"), index=True)
     status = Column(String(20), default="confirmed")  # confirmed, cancelled
     booking_date = Column(DateTime(timezone=True), server_default=func.now())
     
     user = relationship("User", back_populates="bookings")
     slot = relationship("Slot", back_populates="bookings")
 
+# Archive tables for finished bookings and expired slots, moved by archival.py.
+# Rows keep their original ids so history can be merged with the hot tables.
+class BookingArchive(Base):
+    __tablename__ = "bookings_archive"
+    
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    user_id = Column(Integer, index=True)
+    slot_id = Column(Integer)
+    status = Column(String(20))
+    booking_date = Column(DateTime(timezone=True), index=True)
+    # Snapshot of the slot, which may itself be archived later
+    doctor_name = Column(String(100))
+    specialty = Column(String(100))
+    slot_date = Column(String(20))
+    slot_time = Column(String(10))
+    price = Column(Float)
+    hospital_name = Column(String(200))
+    archived_at = Column(DateTime(timezone=True), server_default=func.now())
+
+class SlotArchive(Base):
+    __tablename__ = "slots_archive"
+    
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    hospital_id = Column(Integer)
+    schedule_id = Column(Integer, nullable=True)
+    doctor_name = Column(String(100))
+    specialty = Column(String(100))
+    date = Column(String(20), index=True)
+    time = Column(String(10))
+    price = Column(Float)
+    is_available = Column(Boolean)
+    archived_at = Column(DateTime(timezone=True), server_default=func.now())
+
+class IdempotencyKey(Base):
+    __tablename__ = "idempotency_keys"
+    
+    key = Column(String(255), primary_key=True)  # "<scope>:<Idempotency-Key header>"
+    request_hash = Column(String(64))
+    status_code = Column(Integer, nullable=True)  # None while the first request is in flight
+    response_body = Column(Text, nullable=True)  # JSON
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    expires_at = Column(DateTime(timezone=True), index=True)
+
 class Mantra(Base):
     __tablename__ = "mantras"
     
@@ -96,12 +202,149 @@ class DietPlan(Base):
     meal_plan = Column(Text)  # JSON string of meal plans
     duration = Column(String(50))  # e.g., "7 days"
 
-def get_db():
+def _sticky_key(request: Request):
+    # The bearer token identifies the client without another user lookup
+    return request.headers.get("authorization")
+
+@event.listens_for(SessionLocal, "after_commit")
+def _remember_write(session):
+    key = session.info.get("sticky_key")
+    if key:
+        now = time.monotonic()
+        if len(_recent_writes) > 10000:
+            for stale in [k for k, t in _recent_writes.items() if now - t > READ_STICKY_SECONDS]:
+                del _recent_writes[stale]
+        _recent_writes[key] = now
+
+def _is_sticky(key):
+    written_at = _recent_writes.get(key)
+    if written_at is None:
+        return False
+    if time.monotonic() - written_at > READ_STICKY_SECONDS:
+        _recent_writes.pop(key, None)
+        return False
+    return True
+
+def pool_wait_seconds():
+    """Recent connection checkout wait, decayed towards zero while idle."""
+    average, sampled_at = _pool_wait
+    return average * 0.5 ** ((time.monotonic() - sampled_at) / POOL_WAIT_HALF_LIFE_SECONDS)
+
+def _record_pool_wait(seconds):
+    _pool_wait[:] = [0.8 * pool_wait_seconds() + 0.2 * seconds, time.monotonic()]
+
+def pool_saturated():
+    """True when every pooled primary connection is in use and new sessions
+    have to open overflow connections or wait."""
+    pool = engine.pool
+    return hasattr(pool, "checkedout") and pool.checkedout() >= pool.size()
+
+def _begin(db, deadline):
+    """Check out the session's connection up front, in the threadpool, timing the wait.
+
+    `deadline` (monotonic seconds) bounds the session's statements, see load_shedding.py.
+    """
+    db.info["deadline"] = deadline
+    started = time.monotonic()
+    try:
+        db.connection()
+    except Exception as e:
+        # The caller never gets the session, so nothing else would close it
+        db.close()
+        if isinstance(e, PoolTimeoutError):
+            _record_pool_wait(time.monotonic() - started)
+        raise
+    _record_pool_wait(time.monotonic() - started)
+    return db
+
+def _open_read_session(key, deadline=None):
+    global _replica_down_until
+    if ReadSessionLocal is None or time.monotonic() < _replica_down_until:
+        return _begin(SessionLocal(), deadline)
+    if key and _is_sticky(key):
+        return _begin(SessionLocal(), deadline)
+
+    db = ReadSessionLocal()
+    try:
+        _begin(db, deadline)
+    except OperationalError as e:
+        print(f"Read replica unavailable, falling back to primary: {e}")
+        _replica_down_until = time.monotonic() + READ_RETRY_SECONDS
+        return _begin(SessionLocal(), deadline)
+    return db
+
+def get_db(request: Request):
     db = SessionLocal()
+    db.info["sticky_key"] = _sticky_key(request)
+    try:
+        _begin(db, getattr(request.state, "deadline", None))
+        yield db
+    finally:
+        db.close()
+
+def get_read_db(request: Request):
+    """Session for read-only endpoints: the replica when configured and healthy,
+    the primary right after the same client committed a write."""
+    db = _open_read_session(_sticky_key(request), getattr(request.state, "deadline", None))
     try:
         yield db
     finally:
         db.close()
 
+# Columns added to tables that existing deployments created before them.
+# create_all() only creates missing tables, so upgrade_schema() adds these.
+ADDED_COLUMNS = {
+    "slots": ["schedule_id"],
+    "hospitals": ["latitude", "longitude"],
+}
+
+# Coordinates of the hospitals seed_data.py creates. Databases seeded before
+# hospitals had coordinates get them from upgrade_schema(), matched by name.
+SEED_HOSPITAL_COORDINATES = {
+    "Ayurveda Wellness Center": (19.076, 72.8777),
+    "Kerala Ayurveda Hospital": (9.9312, 76.2673),
+    "Himalayan Ayurveda Clinic": (30.0869, 78.2676),
+}
+
+def upgrade_schema(bind=engine):
+    """Add missing columns from ADDED_COLUMNS and any missing model indexes, and
+    fill in seed hospital coordinates. Safe to rerun."""
+    for table_name, column_names in ADDED_COLUMNS.items():
+        existing = {column["name"] for column in inspect(bind).get_columns(table_name)}
+        for name in column_names:
+            if name in existing:
+                continue
+            column_type = Base.metadata.tables[table_name].c[name].type.compile(bind.dialect)
+            try:
+                with bind.begin() as conn:
+                    conn.execute(text(f"ALTER TABLE {table_name} ADD COLUMN {name} {column_type}"))
+                print(f"Added column {table_name}.{name}")
+            except (OperationalError, ProgrammingError) as e:
+                # Another worker starting up may have added it first
+                print(f"Could not add column {table_name}.{name}: {e}")
+
+    for table in Base.metadata.sorted_tables:
+        existing = {index["name"] for index in inspect(bind).get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name in existing:
+                continue
+            try:
+                index.create(bind)
+                print(f"Created index {index.name}")
+            except (OperationalError, ProgrammingError) as e:
+                print(f"Could not create index {index.name}: {e}")
+
+    hospitals = Hospital.__table__
+    with bind.begin() as conn:
+        for name, (latitude, longitude) in SEED_HOSPITAL_COORDINATES.items():
+            filled = conn.execute(
+                hospitals.update()
+                .where(hospitals.c.name == name, hospitals.c.latitude == None, hospitals.c.longitude == None)
+                .values(latitude=latitude, longitude=longitude)
+            ).rowcount
+            if filled:
+                print(f"Added coordinates for {name}")
+
 def create_tables():
     Base.metadata.create_all(bind=engine)
+    upgrade_schema()
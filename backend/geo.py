@@ -0,0 +1,131 @@
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from database import Hospital
+import numpy as np
+import math
+import os
+import time
+from dotenv import load_dotenv
+
+load_dotenv()
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE_LAT = 111.195
+
+GEO_CELL_DEGREES = float(os.getenv("GEO_CELL_DEGREES", 0.25))
+GEO_MAX_RADIUS_KM = float(os.getenv("GEO_MAX_RADIUS_KM", 200))
+GEO_MAX_HOSPITALS = int(os.getenv("GEO_MAX_HOSPITALS", 200))
+# How long the in-process hospital index is reused before being rebuilt
+GEO_INDEX_TTL_SECONDS = int(os.getenv("GEO_INDEX_TTL_SECONDS", 300))
+
+def haversine_km(lat, lon, lats, lons):
+    """Great-circle distance in km from one point to arrays of points."""
+    lat, lon = math.radians(lat), math.radians(lon)
+    lats, lons = np.radians(lats), np.radians(lons)
+    a = np.sin((lats - lat) / 2) ** 2 + math.cos(lat) * np.cos(lats) * np.sin((lons - lon) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+class GridIndex:
+    """Fixed lat/lon grid over points; a radius query only scans nearby cells."""
+
+    def __init__(self, ids, lats, lons, cell_degrees: float = GEO_CELL_DEGREES):
+        self.cell = cell_degrees
+        self.lon_cells = math.ceil(360 / cell_degrees)
+        self.ids = np.asarray(ids, dtype=np.int64)
+        self.lats = np.asarray(lats, dtype=np.float64)
+        self.lons = np.asarray(lons, dtype=np.float64)
+
+        rows = np.floor((self.lats + 90) / self.cell).astype(np.int64)
+        cols = np.floor((self.lons + 180) / self.cell).astype(np.int64) % self.lon_cells
+        keys = rows * self.lon_cells + cols
+        order = np.argsort(keys, kind="stable")
+        unique, starts = np.unique(keys[order], return_index=True)
+        ends = np.append(starts[1:], len(order))
+        self.cells = {int(key): order[start:end] for key, start, end in zip(unique, starts, ends)}
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _candidates(self, lat, lon, radius_km):
+        lat_span = radius_km / KM_PER_DEGREE_LAT
+        row_min = math.floor((max(lat - lat_span, -90) + 90) / self.cell)
+        row_max = math.floor((min(lat + lat_span, 90) + 90) / self.cell)
+        # Widest longitude span is at the latitude edge closest to a pole
+        cos_lat = math.cos(math.radians(min(abs(lat) + lat_span, 90)))
+        if cos_lat < 1e-6 or radius_km / (KM_PER_DEGREE_LAT * cos_lat) >= 180:
+            cols = range(self.lon_cells)
+        else:
+            lon_span = radius_km / (KM_PER_DEGREE_LAT * cos_lat)
+            col_min = math.floor((lon - lon_span + 180) / self.cell)
+            col_max = math.floor((lon + lon_span + 180) / self.cell)
+            cols = {col % self.lon_cells for col in range(col_min, col_max + 1)}
+
+        found = [
+            self.cells[key]
+            for row in range(row_min, row_max + 1)
+            for col in cols
+            if (key := row * self.lon_cells + col) in self.cells
+        ]
+        return np.concatenate(found) if found else np.empty(0, dtype=np.int64)
+
+    def query(self, lat: float, lon: float, radius_km: float, limit=None):
+        """(id, distance_km) pairs within radius_km, nearest first."""
+        candidates = self._candidates(lat, lon, radius_km)
+        if not len(candidates):
+            return []
+        distances = haversine_km(lat, lon, self.lats[candidates], self.lons[candidates])
+        inside = distances <= radius_km
+        candidates, distances = candidates[inside], distances[inside]
+        order = np.argsort(distances, kind="stable")
+        if limit is not None:
+            order = order[:limit]
+        return [(int(self.ids[i]), float(d)) for i, d in zip(candidates[order], distances[order])]
+
+_cached_index = None
+_cached_at = 0.0
+
+def hospital_index(db: Session):
+    global _cached_index, _cached_at
+    if _cached_index is None or time.monotonic() - _cached_at > GEO_INDEX_TTL_SECONDS:
+        rows = db.query(Hospital.id, Hospital.latitude, Hospital.longitude).filter(
+            Hospital.latitude != None, Hospital.longitude != None
+        ).all()
+        _cached_index = GridIndex([r.id for r in rows], [r.latitude for r in rows], [r.longitude for r in rows])
+        _cached_at = time.monotonic()
+    return _cached_index
+
+_postgis = {}
+
+def postgis_available(db: Session):
+    bind = db.get_bind()
+    if bind.url not in _postgis:
+        available = False
+        if bind.dialect.name == "postgresql":
+            available = db.execute(text("SELECT 1 FROM pg_extension WHERE extname = 'postgis'")).first() is not None
+        _postgis[bind.url] = available
+    return _postgis[bind.url]
+
+_POINT = "geography(ST_SetSRID(ST_MakePoint(longitude, latitude), 4326))"
+
+def ensure_postgis_index(db: Session):
+    """Expression GiST index backing ST_DWithin on the lat/lon columns."""
+    if postgis_available(db):
+        db.execute(text(f"CREATE INDEX IF NOT EXISTS ix_hospitals_geography ON hospitals USING gist (({_POINT}))"))
+        db.commit()
+
+def nearby_hospitals(db: Session, lat: float, lon: float, radius_km: float, limit: int):
+    """(hospital id, distance_km) pairs within radius_km, nearest first.
+
+    Uses PostGIS when the extension is installed, the in-process grid otherwise.
+    """
+    if postgis_available(db):
+        rows = db.execute(text(f"""
+            SELECT id, ST_Distance({_POINT}, geography(ST_SetSRID(ST_MakePoint(:lon, :lat), 4326))) / 1000 AS distance_km
+            FROM hospitals
+            WHERE latitude IS NOT NULL AND longitude IS NOT NULL
+              AND ST_DWithin({_POINT}, geography(ST_SetSRID(ST_MakePoint(:lon, :lat), 4326)), :radius_m)
+            ORDER BY distance_km
+            LIMIT :limit
+        """), {"lat": lat, "lon": lon, "radius_m": radius_km * 1000, "limit": limit}).all()
+        return [(row.id, float(row.distance_km)) for row in rows]
+    return hospital_index(db).query(lat, lon, radius_km, limit)
@@ -0,0 +1,241 @@
+from datetime import datetime, timedelta, timezone
+from fastapi import HTTPException, status
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+from database import SessionLocal, IdempotencyKey
+from auth import SECRET_KEY
+import asyncio
+import hashlib
+import hmac
+import json
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# How long a stored response is replayed for
+IDEMPOTENCY_TTL_SECONDS = int(os.getenv("IDEMPOTENCY_TTL_SECONDS", 86400))
+# How long a request may hold a key before it counts as abandoned
+IDEMPOTENCY_LOCK_SECONDS = int(os.getenv("IDEMPOTENCY_LOCK_SECONDS", 60))
+# How long a duplicate waits for the original request held by another worker
+IDEMPOTENCY_WAIT_SECONDS = float(os.getenv("IDEMPOTENCY_WAIT_SECONDS", 10))
+IDEMPOTENCY_PURGE_INTERVAL_SECONDS = int(os.getenv("IDEMPOTENCY_PURGE_INTERVAL_SECONDS", 300))
+IDEMPOTENCY_PURGE_BATCH_SIZE = int(os.getenv("IDEMPOTENCY_PURGE_BATCH_SIZE", 1000))
+
+MAX_KEY_LENGTH = 128
+
+# (event loop, key) -> (request hash, future resolving to the stored (status, body) or None)
+_in_flight = {}
+
+def _now():
+    return datetime.now(timezone.utc)
+
+def _as_utc(value: datetime):
+    # SQLite hands timezone-aware columns back as naive UTC values
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+def secret_digest(value: str):
+    """Keyed hash of a secret request field, so it can take part in the
+    fingerprint without being stored."""
+    return hmac.new((SECRET_KEY or "").encode(), value.encode(), hashlib.sha256).hexdigest()
+
+def _request_hash(payload: dict):
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+
+def _commit_claim(db: Session):
+    deadline = db.info.get("deadline")
+    db.commit()
+    # The claim is bookkeeping; the request's own work that follows still runs under its deadline
+    db.info["deadline"] = deadline
+
+def _claim(key: str, request_hash: str, db: Session):
+    """Try to take ownership of a key, committing the claim in the request's session.
+
+    Returns ("claimed", None), ("done", (status_code, body)), ("pending", None)
+    or ("mismatch", None) when the key was used for a different request.
+    """
+    now = _now()
+    db.add(IdempotencyKey(
+        key=key, request_hash=request_hash,
+        expires_at=now + timedelta(seconds=IDEMPOTENCY_LOCK_SECONDS)
+    ))
+    try:
+        _commit_claim(db)
+        return "claimed", None
+    except IntegrityError:
+        db.rollback()
+
+    record = db.query(IdempotencyKey).filter(IdempotencyKey.key == key).first()
+    if record is None:
+        # Purged between our insert and read; the caller retries
+        return "pending", None
+    # Keep it out of the identity map, where the next poll's insert would collide with it
+    db.expunge(record)
+    if _as_utc(record.expires_at) < now:
+        # Expired response or abandoned request: take it over unless someone beat us to it
+        taken = db.query(IdempotencyKey).filter(
+            IdempotencyKey.key == key, IdempotencyKey.expires_at == record.expires_at
+        ).update({
+            "request_hash": request_hash,
+            "status_code": None,
+            "response_body": None,
+            "expires_at": now + timedelta(seconds=IDEMPOTENCY_LOCK_SECONDS)
+        }, synchronize_session=False)
+        _commit_claim(db)
+        return ("claimed", None) if taken else ("pending", None)
+    if record.request_hash != request_hash:
+        return "mismatch", None
+    if record.status_code is None:
+        return "pending", None
+    return "done", (record.status_code, json.loads(record.response_body))
+
+def _record(key: str, outcome, db: Session):
+    """Write the response into the key's row, as part of db's open transaction."""
+    status_code, body = outcome
+    db.query(IdempotencyKey).filter(IdempotencyKey.key == key).update({
+        "status_code": status_code,
+        "response_body": json.dumps(body),
+        "expires_at": _now() + timedelta(seconds=IDEMPOTENCY_TTL_SECONDS)
+    }, synchronize_session=False)
+
+def _finish_failed(key: str, outcome, db: Session):
+    """Discard the failed request's work, then store its 4xx outcome or release the key."""
+    # Start over on a fresh connection and transaction, free of the request's deadline
+    db.close()
+    db.info.pop("deadline", None)
+    try:
+        if outcome is None:
+            db.query(IdempotencyKey).filter(
+                IdempotencyKey.key == key, IdempotencyKey.status_code == None
+            ).delete(synchronize_session=False)
+        else:
+            _record(key, outcome, db)
+        db.commit()
+    except Exception as e:
+        # Nothing of the request was committed, so a retry once the claim expires is safe
+        db.rollback()
+        print(f"Could not finish idempotency key {key}: {e}")
+
+def _replay(outcome):
+    status_code, body = outcome
+    return JSONResponse(status_code=status_code, content=body, headers={"Idempotent-Replayed": "true"})
+
+def _mismatch():
+    return HTTPException(
+        status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+        detail="Idempotency-Key was already used for a different request"
+    )
+
+async def _wait_for_claim(key: str, request_hash: str, db: Session):
+    """Claim the key, waiting while another worker processes it.
+
+    Returns None once claimed, or the stored (status_code, body) to replay.
+    """
+    deadline = asyncio.get_running_loop().time() + IDEMPOTENCY_WAIT_SECONDS
+    while True:
+        state, outcome = await run_in_threadpool(_claim, key, request_hash, db)
+        if state == "claimed":
+            return None
+        if state == "done":
+            return outcome
+        if state == "mismatch":
+            raise _mismatch()
+        if asyncio.get_running_loop().time() >= deadline:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="A request with this Idempotency-Key is still being processed"
+            )
+        await asyncio.sleep(0.1)
+
+async def run_idempotent(idempotency_key, scope: str, payload: dict, handler, db: Session):
+    """Run handler once per Idempotency-Key and replay its response on retries.
+
+    handler does its work in db without committing; it is committed here
+    together with the stored response, so a retry never re-runs committed work.
+    The first response (success or 4xx) is stored for IDEMPOTENCY_TTL_SECONDS.
+    Concurrent duplicates in this worker share the original's result; duplicates
+    on other workers poll the stored record. Server errors are not stored, so a
+    retry after one runs the handler again.
+    """
+    if idempotency_key is None:
+        result = handler()
+        db.commit()
+        return result
+    if not idempotency_key or len(idempotency_key) > MAX_KEY_LENGTH:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Idempotency-Key must be 1 to {MAX_KEY_LENGTH} characters"
+        )
+
+    key = f"{scope}:{idempotency_key}"
+    request_hash = _request_hash(payload)
+    loop = asyncio.get_running_loop()
+    while (loop, key) in _in_flight:
+        in_flight_hash, future = _in_flight[(loop, key)]
+        if in_flight_hash != request_hash:
+            raise _mismatch()
+        outcome = await asyncio.shield(future)
+        if outcome is not None:
+            return _replay(outcome)
+
+    future = loop.create_future()
+    _in_flight[(loop, key)] = (request_hash, future)
+    outcome = None
+    try:
+        stored = await _wait_for_claim(key, request_hash, db)
+        if stored is not None:
+            outcome = stored
+            return _replay(stored)
+
+        try:
+            result = handler()
+            succeeded = (status.HTTP_200_OK, jsonable_encoder(result))
+            _record(key, succeeded, db)
+            db.commit()
+        except HTTPException as e:
+            if e.status_code < 500:
+                outcome = (e.status_code, {"detail": e.detail})
+            await run_in_threadpool(_finish_failed, key, outcome, db)
+            raise
+        except Exception:
+            await run_in_threadpool(_finish_failed, key, None, db)
+            raise
+
+        outcome = succeeded
+        return result
+    finally:
+        _in_flight.pop((loop, key), None)
+        future.set_result(outcome)
+
+def purge_expired_keys(batch_size: int = IDEMPOTENCY_PURGE_BATCH_SIZE):
+    """Delete expired keys in batches, using the index on expires_at."""
+    db = SessionLocal()
+    try:
+        purged = 0
+        while True:
+            expired = db.query(IdempotencyKey.key).filter(
+                IdempotencyKey.expires_at < _now()
+            ).limit(batch_size).all()
+            if not expired:
+                return purged
+            db.query(IdempotencyKey).filter(
+                IdempotencyKey.key.in_([row.key for row in expired]),
+                IdempotencyKey.expires_at < _now()
+            ).delete(synchronize_session=False)
+            db.commit()
+            purged += len(expired)
+            if len(expired) < batch_size:
+                return purged
+    finally:
+        db.close()
+
+async def purge_periodically():
+    while True:
+        await asyncio.sleep(IDEMPOTENCY_PURGE_INTERVAL_SECONDS)
+        try:
+            await run_in_threadpool(purge_expired_keys)
+        except Exception as e:
+            print(f"Idempotency key purge failed: {e}")
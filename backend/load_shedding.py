@@ -0,0 +1,147 @@
+from fastapi import Request, status
+from fastapi.responses import JSONResponse
+from sqlalchemy import event
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+from database import engine, read_engine, pool_wait_seconds, pool_saturated
+import os
+import time
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Requests one worker process serves at once before even bookings and auth are turned away
+SHED_MAX_IN_FLIGHT = int(os.getenv("SHED_MAX_IN_FLIGHT", 64))
+# Average connection checkout wait above which content and chat are turned away
+SHED_POOL_WAIT_MS = float(os.getenv("SHED_POOL_WAIT_MS", 200))
+SHED_RETRY_AFTER_SECONDS = int(os.getenv("SHED_RETRY_AFTER_SECONDS", 2))
+
+# Per-priority time budget for a request's DB work, in seconds
+DEADLINES = {
+    "high": float(os.getenv("DEADLINE_HIGH_SECONDS", 10)),
+    "normal": float(os.getenv("DEADLINE_NORMAL_SECONDS", 5)),
+    "low": float(os.getenv("DEADLINE_LOW_SECONDS", 3)),
+}
+
+# Path prefix -> priority; anything else is "normal"
+ROUTE_PRIORITIES = [
+    ("/auth", "high"),
+    ("/bookings", "high"),
+    ("/chat", "low"),
+    ("/mantras", "low"),
+    ("/recipes", "low"),
+    ("/diet-plans", "low"),
+]
+
+# Share of SHED_MAX_IN_FLIGHT each priority may fill
+_IN_FLIGHT_SHARE = {"high": 1.0, "normal": 0.8, "low": 0.5}
+# Multiple of SHED_POOL_WAIT_MS each priority tolerates
+_POOL_WAIT_SHARE = {"high": None, "normal": 2.0, "low": 1.0}
+
+_in_flight = 0
+
+class DeadlineExceeded(Exception):
+    pass
+
+def route_priority(path: str):
+    for prefix, priority in ROUTE_PRIORITIES:
+        if path == prefix or path.startswith(prefix + "/"):
+            return priority
+    return "normal"
+
+def shed_reason(priority: str):
+    """Why a new request of this priority should be turned away, or None to admit it."""
+    if _in_flight >= SHED_MAX_IN_FLIGHT * _IN_FLIGHT_SHARE[priority]:
+        return "too many requests in flight"
+    wait_share = _POOL_WAIT_SHARE[priority]
+    if wait_share is not None and pool_wait_seconds() * 1000 >= SHED_POOL_WAIT_MS * wait_share:
+        return "database pool is slow"
+    if priority == "low" and pool_saturated():
+        return "database pool is saturated"
+    return None
+
+def _busy_response(detail: str):
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": detail},
+        headers={"Retry-After": str(SHED_RETRY_AFTER_SECONDS)}
+    )
+
+class LoadSheddingMiddleware:
+    """Turns requests away with 503 before they queue on a saturated worker or
+    DB pool, shedding content and chat first and bookings and auth last.
+
+    Admitted requests get a deadline in request.state, which bounds their DB work.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        global _in_flight
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        priority = route_priority(scope["path"])
+        reason = shed_reason(priority)
+        if reason:
+            await _busy_response(f"Server busy ({reason}), please retry shortly")(scope, receive, send)
+            return
+
+        scope.setdefault("state", {})["deadline"] = time.monotonic() + DEADLINES[priority]
+        _in_flight += 1
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _in_flight -= 1
+
+@event.listens_for(Session, "after_begin")
+def _apply_deadline(session, transaction, connection):
+    """Bound a request session's transactions, up to its first commit, by what is
+    left of its deadline."""
+    deadline = session.info.get("deadline")
+    if deadline is None:
+        return
+    remaining = deadline - time.monotonic()
+    if remaining <= 0:
+        raise DeadlineExceeded()
+    if connection.dialect.name == "postgresql":
+        connection.exec_driver_sql(f"SET LOCAL statement_timeout = {max(int(remaining * 1000), 1)}")
+    elif connection.dialect.name == "sqlite":
+        # No statement timeout in SQLite; the progress handler aborts the running statement
+        connection.connection.dbapi_connection.set_progress_handler(
+            lambda: time.monotonic() > deadline, 10000
+        )
+
+@event.listens_for(Session, "after_commit")
+def _drop_deadline(session):
+    # Once the request's work has committed, cancelling what follows would
+    # turn a success into a 504 and invite a retry of committed work
+    session.info.pop("deadline", None)
+
+def _clear_deadline(dbapi_connection, connection_record):
+    if dbapi_connection is not None:
+        dbapi_connection.set_progress_handler(None, 0)
+
+for _engine in {engine, read_engine or engine}:
+    if _engine.dialect.name == "sqlite":
+        event.listen(_engine, "checkin", _clear_deadline)
+
+def is_deadline_error(exc: OperationalError):
+    # 57014 is PostgreSQL's query_canceled; SQLite reports an aborted statement as "interrupted"
+    return getattr(exc.orig, "pgcode", None) == "57014" or "interrupted" in str(exc.orig)
+
+async def pool_timeout_handler(request: Request, exc):
+    return _busy_response("Server busy (no database connection available), please retry shortly")
+
+async def deadline_exceeded_handler(request: Request, exc):
+    return JSONResponse(
+        status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+        content={"detail": "Request took too long and was cancelled"}
+    )
+
+async def operational_error_handler(request: Request, exc: OperationalError):
+    if is_deadline_error(exc):
+        return await deadline_exceeded_handler(request, exc)
+    raise exc
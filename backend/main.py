@@ -1,24 +1,46 @@
-from fastapi import FastAPI, Depends, HTTPException, status
+from fastapi import FastAPI, Depends, Header, HTTPException, Query, status
 from fastapi.middleware.cors import CORSMiddleware
+from sqlalchemy.exc import IntegrityError, OperationalError, TimeoutError as PoolTimeoutError
 from sqlalchemy.orm import Session
 from datetime import timedelta
+from typing import Optional
 import google.generativeai as genai
+import asyncio
 import os
 from dotenv import load_dotenv
 
-from database import get_db, create_tables, User, Hospital, Slot, Booking, Mantra, Recipe, DietPlan
-from auth import get_password_hash, verify_password, create_access_token, get_current_user
+from database import SessionLocal, get_db, get_read_db, create_tables, User, Hospital, Slot, Booking, Mantra, Recipe, DietPlan
+from auth import get_password_hash, verify_password, create_access_token, get_current_user, get_current_user_for_read
 from schemas import (
     UserCreate, UserLogin, UserResponse, Token, BookingCreate, BookingResponse,
-    SlotResponse, MantraResponse, RecipeResponse, DietPlanResponse,
+    SlotResponse, NearbySlotResponse, MantraResponse, RecipeResponse, DietPlanResponse,
     ChatMessage, ChatResponse
 )
 from seed_data import seed_all_data
+from schedules import resolve_window, get_slots_for_window, materialize_slot
+from archival import ARCHIVE_INTERVAL_SECONDS, archive_periodically, get_booking_history
+from idempotency import run_idempotent, secret_digest, purge_periodically
+from geo import GEO_MAX_RADIUS_KM, GEO_MAX_HOSPITALS, nearby_hospitals, ensure_postgis_index
+from retrieval import (
+    RETRIEVAL_TOP_K, RETRIEVAL_REFRESH_SECONDS, get_index, refresh_content_index, refresh_periodically,
+    build_chat_prompt
+)
+from load_shedding import (
+    LoadSheddingMiddleware, DeadlineExceeded, is_deadline_error,
+    pool_timeout_handler, deadline_exceeded_handler, operational_error_handler
+)
 
 load_dotenv()
 
 app = FastAPI(title="SwasthyaSetu API", description="Ayurveda and Panchakarma Booking Platform")
 
+# Shed load before requests queue on the DB pool; added first so CORS headers
+# still wrap its 503 responses
+app.add_middleware(LoadSheddingMiddleware)
+app.add_exception_handler(PoolTimeoutError, pool_timeout_handler)
+app.add_exception_handler(DeadlineExceeded, deadline_exceeded_handler)
+app.add_exception_handler(OperationalError, operational_error_handler)
+
 # CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -41,10 +63,37 @@ async def startup_event():
         seed_all_data()
     except Exception as e:
         print(f"Seeding completed or skipped: {e}")
+    db = SessionLocal()
+    try:
+        embedded = refresh_content_index(db)
+        print(f"Content index ready ({embedded} items embedded)")
+    except Exception as e:
+        print(f"Content index refresh failed: {e}")
+    try:
+        ensure_postgis_index(db)
+    except Exception as e:
+        print(f"PostGIS index setup skipped: {e}")
+    finally:
+        db.close()
+    if ARCHIVE_INTERVAL_SECONDS > 0:
+        asyncio.create_task(archive_periodically())
+    asyncio.create_task(purge_periodically())
+    if RETRIEVAL_REFRESH_SECONDS > 0:
+        asyncio.create_task(refresh_periodically())
 
 # Authentication endpoints
 @app.post("/auth/signup", response_model=dict)
-async def signup(user: UserCreate, db: Session = Depends(get_db)):
+async def signup(
+    user: UserCreate,
+    idempotency_key: Optional[str] = Header(None),
+    db: Session = Depends(get_db)
+):
+    # Only a keyed hash of the password goes into the stored request fingerprint
+    payload = user.model_dump(exclude={"password"})
+    payload["password"] = secret_digest(user.password)
+    return await run_idempotent(idempotency_key, "signup", payload, lambda: _signup(user, db), db)
+
+def _signup(user: UserCreate, db: Session):
     try:
         # Check if user already exists
         db_user = db.query(User).filter(
@@ -79,14 +128,16 @@ async def signup(user: UserCreate, db: Session = Depends(get_db)):
             dosha=user.dosha
         )
         db.add(db_user)
-        db.commit()
-        db.refresh(db_user)
+        # Committed by run_idempotent, together with any stored response
+        db.flush()
         
         return {"message": "User created successfully", "wallet_bonus": SIGNUP_BONUS}
     
-    except HTTPException:
+    except (HTTPException, DeadlineExceeded, PoolTimeoutError):
         raise
     except Exception as e:
+        if isinstance(e, OperationalError) and is_deadline_error(e):
+            raise  # Answered with 504 by operational_error_handler
         print(f"Signup error: {e}")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -118,38 +169,71 @@ async def get_current_user_info(current_user: User = Depends(get_current_user)):
 
 # Slot and booking endpoints
 @app.get("/slots", response_model=list[SlotResponse])
-async def get_available_slots(db: Session = Depends(get_db)):
-    slots = db.query(Slot).filter(Slot.is_available == True).all()
-    result = []
+async def get_available_slots(
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    db: Session = Depends(get_read_db)
+):
+    try:
+        start, end = resolve_window(start_date, end_date)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    return get_slots_for_window(db, start, end)
+
+@app.get("/slots/nearby", response_model=list[NearbySlotResponse])
+async def get_nearby_slots(
+    lat: float = Query(..., ge=-90, le=90),
+    lon: float = Query(..., ge=-180, le=180),
+    radius_km: float = Query(25, gt=0, le=GEO_MAX_RADIUS_KM),
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=500),
+    db: Session = Depends(get_read_db)
+):
+    try:
+        start, end = resolve_window(start_date, end_date)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    # Only the nearest GEO_MAX_HOSPITALS hospitals feed the slot query
+    distances = dict(nearby_hospitals(db, lat, lon, radius_km, GEO_MAX_HOSPITALS))
+    if not distances:
+        return []
+    slots = get_slots_for_window(db, start, end, hospital_ids=list(distances))
     for slot in slots:
-        slot_dict = {
-            "id": slot.id,
-            "hospital_id": slot.hospital_id,
-            "doctor_name": slot.doctor_name,
-            "specialty": slot.specialty,
-            "date": slot.date,
-            "time": slot.time,
-            "price": slot.price,
-            "is_available": slot.is_available,
-            "hospital": {
-                "id": slot.hospital.id,
-                "name": slot.hospital.name,
-                "location": slot.hospital.location,
-                "rating": slot.hospital.rating
-            }
-        }
-        result.append(slot_dict)
-    return result
+        slot["distance_km"] = round(distances[slot["hospital_id"]], 2)
+    slots.sort(key=lambda s: (s["distance_km"], s["date"], s["time"]))
+    return slots[:limit]
 
 @app.post("/bookings", response_model=dict)
 async def create_booking(
     booking: BookingCreate,
+    idempotency_key: Optional[str] = Header(None),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
+    return await run_idempotent(
+        idempotency_key, f"bookings:{current_user.id}", booking.model_dump(),
+        lambda: _create_booking(booking, current_user, db), db
+    )
+
+def _create_booking(booking: BookingCreate, current_user: User, db: Session):
     # Check if slot exists and is available
-    slot = db.query(Slot).filter(Slot.id == booking.slot_id, Slot.is_available == True).first()
-    if not slot:
+    if booking.slot_id is not None:
+        slot = db.query(Slot).filter(Slot.id == booking.slot_id).first()
+    elif booking.schedule_id is not None and booking.date and booking.time:
+        slot = materialize_slot(db, booking.schedule_id, booking.date, booking.time)
+    else:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Provide slot_id or schedule_id, date and time"
+        )
+    if not slot or not slot.is_available:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Slot not found or not available"
@@ -163,41 +247,36 @@ async def create_booking(
         )
     
     # Create booking
-    db_booking = Booking(user_id=current_user.id, slot_id=slot.id)
+    db_booking = Booking(user_id=current_user.id, slot=slot)
     db.add(db_booking)
     
     # Update user wallet and slot availability
     current_user.wallet_balance -= slot.price
     slot.is_available = False
+    # Read before commit, which expires the instance and would reload it
+    remaining_balance = current_user.wallet_balance
     
-    db.commit()
+    # Committed by run_idempotent, together with any stored response
+    try:
+        db.flush()
+    except IntegrityError:
+        # Another request booked the same schedule slot first
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Slot not found or not available"
+        )
     
-    return {"message": "Booking created successfully", "remaining_balance": current_user.wallet_balance}
+    return {"message": "Booking created successfully", "remaining_balance": remaining_balance}
 
 @app.get("/bookings", response_model=list[BookingResponse])
 async def get_user_bookings(
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    limit: Optional[int] = Query(None, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+    current_user: User = Depends(get_current_user_for_read),
+    db: Session = Depends(get_read_db)
 ):
-    bookings = db.query(Booking).filter(Booking.user_id == current_user.id).all()
-    result = []
-    for booking in bookings:
-        booking_dict = {
-            "id": booking.id,
-            "slot_id": booking.slot_id,
-            "status": booking.status,
-            "booking_date": booking.booking_date,
-            "slot": {
-                "doctor_name": booking.slot.doctor_name,
-                "specialty": booking.slot.specialty,
-                "date": booking.slot.date,
-                "time": booking.slot.time,
-                "price": booking.slot.price,
-                "hospital_name": booking.slot.hospital.name
-            }
-        }
-        result.append(booking_dict)
-    return result
+    return get_booking_history(db, current_user.id, limit, offset)
 
 @app.put("/bookings/{booking_id}/cancel")
 async def cancel_booking(
@@ -227,28 +306,29 @@ async def cancel_booking(
     slot = db.query(Slot).filter(Slot.id == booking.slot_id).first()
     slot.is_available = True
     current_user.wallet_balance += slot.price
+    refunded_amount = slot.price
     
     db.commit()
     
-    return {"message": "Booking cancelled successfully", "refunded_amount": slot.price}
+    return {"message": "Booking cancelled successfully", "refunded_amount": refunded_amount}
 
 # Content endpoints
 @app.get("/mantras", response_model=list[MantraResponse])
-async def get_mantras(dosha: str = None, db: Session = Depends(get_db)):
+async def get_mantras(dosha: str = None, db: Session = Depends(get_read_db)):
     query = db.query(Mantra)
     if dosha:
         query = query.filter((Mantra.dosha == dosha) | (Mantra.dosha == "all"))
     return query.all()
 
 @app.get("/recipes", response_model=list[RecipeResponse])
-async def get_recipes(dosha: str = None, db: Session = Depends(get_db)):
+async def get_recipes(dosha: str = None, db: Session = Depends(get_read_db)):
     query = db.query(Recipe)
     if dosha:
         query = query.filter((Recipe.dosha == dosha) | (Recipe.dosha == "all"))
     return query.all()
 
 @app.get("/diet-plans", response_model=list[DietPlanResponse])
-async def get_diet_plans(dosha: str = None, db: Session = Depends(get_db)):
+async def get_diet_plans(dosha: str = None, db: Session = Depends(get_read_db)):
     query = db.query(DietPlan)
     if dosha:
         query = query.filter((DietPlan.dosha == dosha) | (DietPlan.dosha == "all"))
@@ -261,15 +341,14 @@ async def chat_with_ai(
     current_user: User = Depends(get_current_user)
 ):
     try:
-        # Create a context-aware prompt for Ayurveda
-        prompt = f"""
-        You are an expert Ayurveda and Panchakarma consultant. The user's dosha is {current_user.dosha}.
-        Please provide helpful, accurate information about Ayurveda, Panchakarma treatments, diet recommendations,
-        lifestyle advice, and general wellness tips. Keep responses informative but concise.
-        
-        User question: {message.message}
-        """
-        
+        # Ground the prompt in the few most relevant mantras, recipes and diet plans
+        retrieved = get_index().search(message.message, RETRIEVAL_TOP_K, dosha=current_user.dosha)
+    except Exception as e:
+        print(f"Content retrieval failed: {e}")
+        retrieved = []
+    
+    try:
+        prompt = build_chat_prompt(current_user.dosha, message.message, retrieved)
         response = model.generate_content(prompt)
         return ChatResponse(response=response.text)
     except Exception as e:
@@ -10,9 +10,13 @@ def reset_database():
     # Drop tables manually with CASCADE
     with engine.connect() as conn:
         conn.execute(text("DROP TABLE IF EXISTS bookings CASCADE"))
+        conn.execute(text("DROP TABLE IF EXISTS bookings_archive CASCADE"))
+        conn.execute(text("DROP TABLE IF EXISTS slots_archive CASCADE"))
         conn.execute(text("DROP TABLE IF EXISTS slots CASCADE"))
+        conn.execute(text("DROP TABLE IF EXISTS doctor_schedules CASCADE"))
         conn.execute(text("DROP TABLE IF EXISTS hospitals CASCADE"))
         conn.execute(text("DROP TABLE IF EXISTS users CASCADE"))
+        conn.execute(text("DROP TABLE IF EXISTS idempotency_keys CASCADE"))
         conn.execute(text("DROP TABLE IF EXISTS mantras CASCADE"))
         conn.execute(text("DROP TABLE IF EXISTS recipes CASCADE"))
         conn.execute(text("DROP TABLE IF EXISTS diet_plans CASCADE"))
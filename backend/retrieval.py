@@ -0,0 +1,311 @@
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+from database import SessionLocal, Mantra, Recipe, DietPlan
+import google.generativeai as genai
+import numpy as np
+import asyncio
+import hashlib
+import json
+import os
+import re
+from dotenv import load_dotenv
+
+try:
+    import fcntl
+except ImportError:  # Windows: single-process development only
+    fcntl = None
+
+load_dotenv()
+
+RETRIEVAL_INDEX_PATH = os.getenv(
+    "RETRIEVAL_INDEX_PATH", os.path.join(os.path.dirname(__file__), "data", "content_index.npy")
+)
+RETRIEVAL_EMBEDDER = os.getenv("RETRIEVAL_EMBEDDER", "hashing")  # hashing or gemini
+RETRIEVAL_TOP_K = int(os.getenv("RETRIEVAL_TOP_K", 3))
+# Characters of each retrieved item that go into the chat prompt
+RETRIEVAL_SNIPPET_CHARS = int(os.getenv("RETRIEVAL_SNIPPET_CHARS", 240))
+# Seconds between re-syncs with the content tables; 0 disables the background task
+RETRIEVAL_REFRESH_SECONDS = int(os.getenv("RETRIEVAL_REFRESH_SECONDS", 300))
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+_STOP_WORDS = frozenset(
+    "a an and are as at be before by can do for from how i in is it me my of on or should "
+    "so that the this to what when which with you your".split()
+)
+
+class HashingEmbedder:
+    """Offline, deterministic embedder: signed feature hashing of words and word pairs."""
+
+    def __init__(self, dim: int = 512):
+        self.dim = dim
+
+    def _features(self, text: str):
+        words = [w for w in _TOKEN.findall(text.lower()) if w not in _STOP_WORDS]
+        return [(w, 1.0) for w in words] + [(f"{a} {b}", 0.5) for a, b in zip(words, words[1:])]
+
+    def embed(self, texts):
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for feature, weight in self._features(text):
+                digest = int.from_bytes(hashlib.blake2b(feature.encode(), digest_size=8).digest(), "little")
+                vectors[row, digest % self.dim] += weight if digest >> 63 else -weight
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-12)
+
+class GeminiEmbedder:
+    """Gemini text embeddings; needs GEMINI_API_KEY and a network call per text."""
+
+    def __init__(self, model: str = "models/embedding-001", dim: int = 768):
+        self.model = model
+        self.dim = dim
+
+    def embed(self, texts):
+        vectors = np.array(
+            [genai.embed_content(model=self.model, content=text)["embedding"] for text in texts],
+            dtype=np.float32
+        ).reshape(len(texts), self.dim)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-12)
+
+def make_embedder(name: str = RETRIEVAL_EMBEDDER):
+    if name == "gemini":
+        return GeminiEmbedder()
+    return HashingEmbedder()
+
+class ContentIndex:
+    """Cosine top-k index over content items, stored in memory-mapped .npy files.
+
+    Rows are L2-normalised, so cosine similarity is one matrix-vector product.
+    Item metadata (key, dosha, title, snippet, content hash) lives in a JSON
+    file next to the vectors, naming the vectors file it belongs to. sync()
+    only embeds new or changed items, and writes them to a new generation of
+    the vectors file instead of changing one that is already mapped.
+    """
+
+    def __init__(self, path: str, embedder):
+        self.path = path
+        self.meta_path = path + ".json"
+        self.embedder = embedder
+        self.generation = 0
+        self.items = []
+        self.rows = {}
+        self.vectors = None
+        self._masks = {}
+        self._load()
+
+    @property
+    def count(self):
+        return len(self.items)
+
+    def _generation_path(self, generation: int):
+        base, ext = os.path.splitext(self.path)
+        return f"{base}.{generation}{ext}"
+
+    def _load(self):
+        if not os.path.exists(self.meta_path):
+            return
+        with open(self.meta_path) as f:
+            meta = json.load(f)
+        if meta.get("dim") != self.embedder.dim or meta.get("embedder") != type(self.embedder).__name__:
+            return  # Built with another embedder: start over
+        # Indexes written before generations keep their vectors at self.path
+        generation = meta.get("generation", 0)
+        vectors_path = self._generation_path(generation) if generation else self.path
+        if not os.path.exists(vectors_path):
+            return
+        self.generation = generation
+        self.items = meta["items"]
+        self.rows = {item["key"]: row for row, item in enumerate(self.items)}
+        self.vectors = np.load(vectors_path, mmap_mode="r")
+
+    def _publish(self, items, vectors):
+        """Make items and the vectors of the next generation current; readers
+        of the previous generation keep their files unchanged."""
+        generation = self.generation + 1
+        vectors.flush()
+        tmp_path = f"{self.meta_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({
+                "dim": self.embedder.dim, "embedder": type(self.embedder).__name__,
+                "generation": generation, "items": items
+            }, f)
+        os.replace(tmp_path, self.meta_path)
+
+        # Keep the generation just replaced for readers that loaded its metadata a moment ago
+        for old in range(self.generation - 1, -1, -1):
+            old_path = self._generation_path(old) if old else self.path
+            if not os.path.exists(old_path):
+                break
+            try:
+                os.remove(old_path)
+            except OSError:
+                pass  # Still mapped on Windows; a later sync removes it
+
+        self.generation = generation
+        self.items = items
+        self.rows = {item["key"]: row for row, item in enumerate(items)}
+        self.vectors = np.load(self._generation_path(generation), mmap_mode="r")
+        self._masks = {}
+
+    def sync(self, items, batch_size: int = 1024):
+        """Bring the index in line with `items` (dicts with key, dosha, title, text).
+
+        Returns the number of items that had to be embedded.
+        """
+        lock = None
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        if fcntl is not None:
+            lock = open(self.path + ".lock", "w")
+            fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            # Another worker may have synced while we waited for the lock
+            self.generation, self.items, self.rows, self.vectors = 0, [], {}, None
+            self._load()
+
+            pending = []
+            seen = set()
+            for item in items:
+                seen.add(item["key"])
+                digest = hashlib.sha1(item["text"].encode()).hexdigest()
+                row = self.rows.get(item["key"])
+                if row is not None and self.items[row]["hash"] == digest and not self.items[row].get("removed"):
+                    continue
+                pending.append((item, digest))
+            removed = [
+                row for row, entry in enumerate(self.items)
+                if entry["key"] not in seen and not entry.get("removed")
+            ]
+            if not pending and not removed:
+                return 0
+
+            # Copies: the loaded generation stays as it is for searches running meanwhile
+            new_items = [dict(entry) for entry in self.items]
+            rows = dict(self.rows)
+            added = sum(1 for item, _ in pending if item["key"] not in rows)
+            vectors = np.lib.format.open_memmap(
+                self._generation_path(self.generation + 1), mode="w+",
+                dtype=np.float32, shape=(self.count + added, self.embedder.dim)
+            )
+            if self.count:
+                vectors[:self.count] = self.vectors[:self.count]
+
+            for start in range(0, len(pending), batch_size):
+                batch = pending[start:start + batch_size]
+                embedded = self.embedder.embed([item["text"] for item, _ in batch])
+                for (item, digest), vector in zip(batch, embedded):
+                    entry = {
+                        "key": item["key"], "dosha": item["dosha"], "title": item["title"],
+                        "snippet": item["text"][:RETRIEVAL_SNIPPET_CHARS], "hash": digest
+                    }
+                    row = rows.get(item["key"])
+                    if row is None:
+                        row = len(new_items)
+                        rows[item["key"]] = row
+                        new_items.append(entry)
+                    else:
+                        new_items[row] = entry
+                    vectors[row] = vector
+
+            for row in removed:
+                new_items[row]["removed"] = True
+                vectors[row] = 0.0
+
+            self._publish(new_items, vectors)
+            return len(pending)
+        finally:
+            if lock is not None:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+                lock.close()
+
+    def _mask(self, dosha):
+        if dosha not in self._masks:
+            self._masks[dosha] = np.array([
+                not item.get("removed") and (dosha is None or item["dosha"] in (dosha, "all"))
+                for item in self.items
+            ], dtype=bool)
+        return self._masks[dosha]
+
+    def search(self, query: str, k: int = RETRIEVAL_TOP_K, dosha=None, min_score: float = 0.0):
+        """The k items most similar to the query, best first, as (item, score) pairs.
+
+        Items scoring at or below min_score are dropped rather than padding the result.
+        """
+        if not self.count:
+            return []
+        scores = self.vectors[:self.count] @ self.embedder.embed([query])[0]
+        scores = np.where(self._mask(dosha), scores, -np.inf)
+        k = min(k, self.count)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(self.items[row], float(scores[row])) for row in top if scores[row] > min_score]
+
+def _sentences(*parts):
+    return " ".join(part.strip().rstrip(".") + "." for part in parts if part)
+
+def content_items(db: Session):
+    """Mantras, recipes and diet plans as indexable items."""
+    items = []
+    for mantra in db.query(Mantra).all():
+        items.append({
+            "key": f"mantra:{mantra.id}", "dosha": mantra.dosha, "title": mantra.title,
+            "text": _sentences(f"Mantra: {mantra.title}", mantra.benefits, f"Practice for {mantra.duration}")
+        })
+    for recipe in db.query(Recipe).all():
+        items.append({
+            "key": f"recipe:{recipe.id}", "dosha": recipe.dosha, "title": recipe.title,
+            "text": _sentences(f"Recipe: {recipe.title}", recipe.benefits, f"Ingredients: {recipe.ingredients}")
+        })
+    for plan in db.query(DietPlan).all():
+        items.append({
+            "key": f"diet_plan:{plan.id}", "dosha": plan.dosha, "title": plan.title,
+            "text": _sentences(f"Diet plan: {plan.title} ({plan.duration})", plan.description)
+        })
+    return items
+
+_index = None
+
+def get_index():
+    global _index
+    if _index is None:
+        _index = ContentIndex(RETRIEVAL_INDEX_PATH, make_embedder())
+    return _index
+
+def refresh_content_index(db: Session):
+    """Sync a fresh index with the content tables and swap it in. The sync
+    writes a new generation of the index files, so searches running meanwhile
+    keep a consistent view of the old one."""
+    global _index
+    index = ContentIndex(RETRIEVAL_INDEX_PATH, get_index().embedder)
+    embedded = index.sync(content_items(db))
+    _index = index
+    return embedded
+
+def _refresh_from_database():
+    db = SessionLocal()
+    try:
+        return refresh_content_index(db)
+    finally:
+        db.close()
+
+async def refresh_periodically():
+    """Pick up content added or edited while the app runs; only changes are embedded."""
+    while True:
+        await asyncio.sleep(RETRIEVAL_REFRESH_SECONDS)
+        try:
+            embedded = await run_in_threadpool(_refresh_from_database)
+            if embedded:
+                print(f"Content index refreshed ({embedded} items embedded)")
+        except Exception as e:
+            print(f"Content index refresh failed: {e}")
+
+def build_chat_prompt(dosha: str, question: str, retrieved):
+    """A compact prompt grounded in our own retrieved content."""
+    lines = [
+        f"You are an Ayurveda and Panchakarma consultant. User dosha: {dosha}.",
+        "Answer concisely. Prefer the platform content below when relevant and mention it by title."
+    ]
+    if retrieved:
+        lines.append("Platform content:")
+        lines.extend(f"- {item['snippet']}" for item, _ in retrieved)
+    lines.append(f"Question: {question}")
+    return "\n".join(lines)
@@ -0,0 +1,162 @@
+from datetime import date, datetime, timedelta
+from sqlalchemy.orm import Session, joinedload
+from database import DoctorSchedule, Slot
+import json
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Default and maximum number of days covered by a /slots request
+SLOT_WINDOW_DAYS = int(os.getenv("SLOT_WINDOW_DAYS", 14))
+SLOT_WINDOW_MAX_DAYS = int(os.getenv("SLOT_WINDOW_MAX_DAYS", 90))
+
+WEEKDAYS = ["mon", "tue", "wed", "thu", "fri", "sat", "sun"]
+
+def parse_date(value: str) -> date:
+    return datetime.strptime(value, "%Y-%m-%d").date()
+
+def _now():
+    return datetime.now()
+
+def is_past(slot_date: str, slot_time: str):
+    """Whether a YYYY-MM-DD / HH:MM slot has already started."""
+    now = _now()
+    return (slot_date, slot_time) <= (now.date().isoformat(), now.strftime("%H:%M"))
+
+def resolve_window(start_date=None, end_date=None):
+    """Turn optional YYYY-MM-DD bounds into an inclusive (start, end) date pair."""
+    start = parse_date(start_date) if start_date else date.today()
+    end = parse_date(end_date) if end_date else start + timedelta(days=SLOT_WINDOW_DAYS - 1)
+    if end < start:
+        raise ValueError("end_date must not be before start_date")
+    if (end - start).days >= SLOT_WINDOW_MAX_DAYS:
+        raise ValueError(f"Slot window cannot exceed {SLOT_WINDOW_MAX_DAYS} days")
+    return start, end
+
+def occurrences(schedule: DoctorSchedule, start: date, end: date):
+    """Yield (date, time) strings for every slot the schedule offers in [start, end]."""
+    pattern = json.loads(schedule.weekly_pattern or "{}")
+    if schedule.valid_from:
+        start = max(start, parse_date(schedule.valid_from))
+    if schedule.valid_until:
+        end = min(end, parse_date(schedule.valid_until))
+
+    day = start
+    while day <= end:
+        for slot_time in pattern.get(WEEKDAYS[day.weekday()], []):
+            yield day.isoformat(), slot_time
+        day += timedelta(days=1)
+
+def _hospital_dict(hospital):
+    return {
+        "id": hospital.id,
+        "name": hospital.name,
+        "location": hospital.location,
+        "rating": hospital.rating
+    }
+
+def _slot_dict(slot: Slot):
+    return {
+        "id": slot.id,
+        "schedule_id": slot.schedule_id,
+        "hospital_id": slot.hospital_id,
+        "doctor_name": slot.doctor_name,
+        "specialty": slot.specialty,
+        "date": slot.date,
+        "time": slot.time,
+        "price": slot.price,
+        "is_available": slot.is_available,
+        "hospital": _hospital_dict(slot.hospital)
+    }
+
+def _virtual_slot_dict(schedule: DoctorSchedule, slot_date: str, slot_time: str):
+    return {
+        "id": None,
+        "schedule_id": schedule.id,
+        "hospital_id": schedule.hospital_id,
+        "doctor_name": schedule.doctor_name,
+        "specialty": schedule.specialty,
+        "date": slot_date,
+        "time": slot_time,
+        "price": schedule.price,
+        "is_available": True,
+        "hospital": _hospital_dict(schedule.hospital)
+    }
+
+def get_slots_for_window(db: Session, start: date, end: date, hospital_ids=None):
+    """Available slots in the window: legacy slot rows plus slots generated from
+    active schedules, with persisted rows overriding the generated ones."""
+    schedule_query = db.query(DoctorSchedule).options(joinedload(DoctorSchedule.hospital)).filter(
+        DoctorSchedule.is_active == True
+    )
+    slot_query = db.query(Slot).options(joinedload(Slot.hospital)).filter(
+        Slot.date >= start.isoformat(), Slot.date <= end.isoformat()
+    )
+    if hospital_ids is not None:
+        schedule_query = schedule_query.filter(DoctorSchedule.hospital_id.in_(hospital_ids))
+        slot_query = slot_query.filter(Slot.hospital_id.in_(hospital_ids))
+
+    result = []
+    persisted = {}
+    for slot in slot_query.all():
+        if slot.schedule_id is None:
+            if slot.is_available and not is_past(slot.date, slot.time):
+                result.append(_slot_dict(slot))
+        else:
+            persisted[(slot.schedule_id, slot.date, slot.time)] = slot
+
+    # Occurrences that have already started can no longer be booked
+    start = max(start, _now().date())
+    for schedule in schedule_query.all():
+        for slot_date, slot_time in occurrences(schedule, start, end):
+            if is_past(slot_date, slot_time):
+                continue
+            slot = persisted.get((schedule.id, slot_date, slot_time))
+            if slot is None:
+                result.append(_virtual_slot_dict(schedule, slot_date, slot_time))
+            elif slot.is_available:
+                result.append(_slot_dict(slot))
+
+    result.sort(key=lambda s: (s["date"], s["time"]))
+    return result
+
+def materialize_slot(db: Session, schedule_id: int, slot_date: str, slot_time: str):
+    """Return the persisted slot for a schedule occurrence, creating it if needed.
+
+    Returns None when the schedule does not offer that date and time, or it has
+    already started. A new slot
+    is only added to the session; if another request persists the same occurrence
+    first, the unique constraint makes this transaction's commit fail.
+    """
+    try:
+        day = parse_date(slot_date)
+    except ValueError:
+        return None
+    if is_past(slot_date, slot_time):
+        return None
+
+    slot = db.query(Slot).filter(
+        Slot.schedule_id == schedule_id, Slot.date == slot_date, Slot.time == slot_time
+    ).first()
+    if slot:
+        return slot
+
+    schedule = db.query(DoctorSchedule).filter(
+        DoctorSchedule.id == schedule_id, DoctorSchedule.is_active == True
+    ).first()
+    if not schedule or (slot_date, slot_time) not in occurrences(schedule, day, day):
+        return None
+
+    slot = Slot(
+        hospital_id=schedule.hospital_id,
+        schedule_id=schedule.id,
+        doctor_name=schedule.doctor_name,
+        specialty=schedule.specialty,
+        date=slot_date,
+        time=slot_time,
+        price=schedule.price,
+        is_available=True
+    )
+    db.add(slot)
+    return slot
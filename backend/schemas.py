@@ -38,7 +38,11 @@ class Token(BaseModel):
 
 # Booking schemas
 class BookingCreate(BaseModel):
-    slot_id: int
+    # Either an existing slot, or a schedule occurrence that is not persisted yet
+    slot_id: Optional[int] = None
+    schedule_id: Optional[int] = None
+    date: Optional[str] = None
+    time: Optional[str] = None
 
 class BookingResponse(BaseModel):
     id: int
@@ -52,7 +56,8 @@ class BookingResponse(BaseModel):
 
 # Slot schemas
 class SlotResponse(BaseModel):
-    id: int
+    id: Optional[int] = None  # None until a schedule slot is booked or overridden
+    schedule_id: Optional[int] = None
     hospital_id: int
     doctor_name: str
     specialty: str
@@ -65,6 +70,9 @@ class SlotResponse(BaseModel):
     class Config:
         from_attributes = True
 
+class NearbySlotResponse(SlotResponse):
+    distance_km: float
+
 # Content schemas
 class MantraResponse(BaseModel):
     id: int
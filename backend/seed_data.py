@@ -1,5 +1,5 @@
 from sqlalchemy.orm import Session
-from database import SessionLocal, Hospital, Slot, Mantra, Recipe, DietPlan
+from database import SessionLocal, SEED_HOSPITAL_COORDINATES, Hospital, Slot, DoctorSchedule, Mantra, Recipe, DietPlan
 import json
 
 def seed_hospitals_and_slots():
@@ -36,7 +36,8 @@ def seed_hospitals_and_slots():
     
     hospitals = []
     for hospital_data in hospitals_data:
-        hospital = Hospital(**hospital_data)
+        latitude, longitude = SEED_HOSPITAL_COORDINATES[hospital_data["name"]]
+        hospital = Hospital(**hospital_data, latitude=latitude, longitude=longitude)
         db.add(hospital)
         hospitals.append(hospital)
     
@@ -68,6 +69,37 @@ def seed_hospitals_and_slots():
     db.commit()
     db.close()
 
+def seed_schedules():
+    db = SessionLocal()
+    
+    # Check if data already exists
+    if db.query(DoctorSchedule).first():
+        db.close()
+        return
+    
+    # Weekly schedules; their slots are generated on demand by /slots
+    schedules_data = [
+        {"hospital_id": 1, "doctor_name": "Dr. Priya Sharma", "specialty": "Panchakarma", "price": 1500.0,
+         "weekly_pattern": json.dumps({"mon": ["09:00", "11:00"], "wed": ["09:00", "11:00"], "fri": ["09:00"]})},
+        {"hospital_id": 1, "doctor_name": "Dr. Rajesh Kumar", "specialty": "Ayurvedic Medicine", "price": 800.0,
+         "weekly_pattern": json.dumps({"tue": ["10:00", "14:00"], "thu": ["10:00", "14:00"]})},
+        {"hospital_id": 2, "doctor_name": "Dr. Meera Nair", "specialty": "Traditional Panchakarma", "price": 2000.0,
+         "weekly_pattern": json.dumps({"mon": ["08:00", "15:00"], "sat": ["08:00"]})},
+        {"hospital_id": 2, "doctor_name": "Dr. Suresh Pillai", "specialty": "Herbal Medicine", "price": 1200.0,
+         "weekly_pattern": json.dumps({"wed": ["09:30"], "fri": ["09:30", "16:00"]})},
+        {"hospital_id": 3, "doctor_name": "Dr. Anand Mishra", "specialty": "Detox Therapy", "price": 1800.0,
+         "weekly_pattern": json.dumps({"tue": ["07:00", "16:00"], "sat": ["07:00"]})},
+        {"hospital_id": 3, "doctor_name": "Dr. Kavita Joshi", "specialty": "Stress Management", "price": 1000.0,
+         "weekly_pattern": json.dumps({"thu": ["10:30"], "sun": ["10:30"]})},
+    ]
+    
+    for schedule_data in schedules_data:
+        schedule = DoctorSchedule(**schedule_data)
+        db.add(schedule)
+    
+    db.commit()
+    db.close()
+
 def seed_content():
     db = SessionLocal()
     
@@ -193,5 +225,6 @@ def seed_content():
 
 def seed_all_data():
     seed_hospitals_and_slots()
+    seed_schedules()
     seed_content()
     print("Database seeded successfully!")
@@ -0,0 +1,132 @@
+from datetime import date, datetime, timedelta
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+import pytest
+
+import archival
+from archival import archive_cutoff, archive_slots_batch, get_booking_history, run_archival
+from database import Base, User, Hospital, Slot, Booking, BookingArchive, SlotArchive
+
+PAST = (date.today() - timedelta(days=30)).isoformat()
+FUTURE = (date.today() + timedelta(days=30)).isoformat()
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    # run_archival works on the whole database, so each test gets its own
+    engine = create_engine(f"sqlite:///{tmp_path / 'archival.db'}")
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    monkeypatch.setattr(archival, "SessionLocal", Session)
+    db = Session()
+    yield db
+    db.close()
+    engine.dispose()
+
+@pytest.fixture
+def user(db):
+    user = User(username="archived", email="archived@example.com", hashed_password="x", wallet_balance=0)
+    hospital = Hospital(name="Kerala Ayurveda Center", location="Kochi")
+    db.add_all([user, hospital])
+    db.commit()
+    return user
+
+def new_slot(db, slot_date, time, is_available):
+    return Slot(
+        hospital_id=db.query(Hospital.id).scalar(), doctor_name="Dr. Nair", specialty="Panchakarma",
+        date=slot_date, time=time, price=100.0, is_available=is_available
+    )
+
+def add_booking(db, user, slot_date, status="confirmed", booking_date=None):
+    slot = new_slot(db, slot_date, "09:00", is_available=False)
+    db.add(slot)
+    db.flush()
+    booking = Booking(user_id=user.id, slot_id=slot.id, status=status, booking_date=booking_date)
+    db.add(booking)
+    db.commit()
+    return booking.id, slot.id
+
+def add_slot(db, slot_date):
+    slot = new_slot(db, slot_date, "11:00", is_available=True)
+    db.add(slot)
+    db.commit()
+    return slot.id
+
+def hot_booking_ids(db):
+    return {id for (id,) in db.query(Booking.id)}
+
+def archived_booking_ids(db):
+    return {id for (id,) in db.query(BookingArchive.id)}
+
+def test_moves_cancelled_and_past_bookings_only(db, user):
+    cancelled, _ = add_booking(db, user, FUTURE, status="cancelled")
+    past, _ = add_booking(db, user, PAST)
+    upcoming, _ = add_booking(db, user, FUTURE)
+
+    assert run_archival()["bookings"] == 2
+    db.expire_all()
+    assert hot_booking_ids(db) == {upcoming}
+    assert archived_booking_ids(db) == {cancelled, past}
+
+    archived = db.get(BookingArchive, past)
+    assert (archived.status, archived.slot_date, archived.hospital_name) == ("confirmed", PAST, "Kerala Ayurveda Center")
+
+def test_run_archival_loops_over_batches(db, user):
+    ids = {add_booking(db, user, PAST)[0] for _ in range(5)}
+    assert run_archival(batch_size=2) == {"bookings": 5, "slots": 5}
+    db.expire_all()
+    assert archived_booking_ids(db) == ids
+    assert not hot_booking_ids(db)
+
+def test_slots_are_archived_once_unreferenced(db, user):
+    _, booked_slot = add_booking(db, user, PAST)
+    free_slot = add_slot(db, PAST)
+    future_slot = add_slot(db, FUTURE)
+
+    assert archive_slots_batch(db, archive_cutoff()) == 1
+    assert {id for (id,) in db.query(SlotArchive.id)} == {free_slot}
+
+    # Archiving the booking releases its slot
+    run_archival()
+    db.expire_all()
+    assert {id for (id,) in db.query(SlotArchive.id)} == {free_slot, booked_slot}
+    assert {id for (id,) in db.query(Slot.id)} == {future_slot}
+
+def test_ids_are_not_reused_after_archival(db, user):
+    first, first_slot = add_booking(db, user, FUTURE, status="cancelled")
+    add_slot(db, PAST)
+    run_archival()
+
+    second, second_slot = add_booking(db, user, FUTURE, status="cancelled")
+    assert second != first and second_slot != first_slot
+    assert run_archival()["bookings"] == 1
+    assert [b["id"] for b in get_booking_history(db, user.id)] == [second, first]
+
+def test_id_collision_does_not_block_archival(db, user):
+    stuck, _ = add_booking(db, user, PAST)
+    moved, _ = add_booking(db, user, PAST)
+    # As left behind by an older SQLite file that reused an archived id
+    db.add(BookingArchive(id=stuck, user_id=user.id, status="cancelled"))
+    db.commit()
+
+    assert run_archival()["bookings"] == 1
+    db.expire_all()
+    assert hot_booking_ids(db) == {stuck}
+    assert archived_booking_ids(db) == {stuck, moved}
+
+def test_history_pages_span_hot_and_archived_bookings(db, user):
+    now = datetime.now()
+    # Alternate archived and upcoming bookings, newest first: 0, 1, ..., 6
+    expected = []
+    for age in range(7):
+        slot_date = PAST if age % 2 else FUTURE
+        expected.append(add_booking(db, user, slot_date, booking_date=now - timedelta(days=age))[0])
+    run_archival()
+    db.expire_all()
+    assert len(archived_booking_ids(db)) == 3
+
+    assert [b["id"] for b in get_booking_history(db, user.id)] == expected
+    for offset in range(0, 8):
+        page = get_booking_history(db, user.id, limit=3, offset=offset)
+        assert [b["id"] for b in page] == expected[offset:offset + 3]
+    archived_row = get_booking_history(db, user.id, limit=1, offset=1)[0]
+    assert archived_row["slot"]["hospital_name"] == "Kerala Ayurveda Center"
@@ -0,0 +1,71 @@
+from sqlalchemy import create_engine, inspect, text
+import numpy as np
+import pytest
+
+from database import Base, upgrade_schema
+from geo import GridIndex, haversine_km
+
+def brute_force(ids, lats, lons, lat, lon, radius_km):
+    distances = haversine_km(lat, lon, lats, lons)
+    return {int(i) for i, d in zip(ids, distances) if d <= radius_km}
+
+def test_haversine_known_distance():
+    # Mumbai to Kochi
+    assert haversine_km(19.0760, 72.8777, np.array([9.9312]), np.array([76.2673]))[0] == pytest.approx(1075, abs=10)
+
+@pytest.mark.parametrize("lat, lon, radius_km", [
+    (10.0, 76.3, 25),
+    (20.0, 78.0, 150),
+    (0.0, 179.9, 100),   # across the antimeridian
+    (89.5, 0.0, 120),    # near the pole
+])
+def test_grid_query_matches_brute_force(lat, lon, radius_km):
+    rng = np.random.default_rng(3)
+    ids = np.arange(5000)
+    lats = np.clip(lat + rng.uniform(-3, 3, len(ids)), -90, 90)
+    lons = (lon + rng.uniform(-3, 3, len(ids)) + 180) % 360 - 180
+    results = GridIndex(ids, lats, lons).query(lat, lon, radius_km)
+    assert {i for i, _ in results} == brute_force(ids, lats, lons, lat, lon, radius_km)
+    distances = [d for _, d in results]
+    assert distances == sorted(distances)
+
+def test_grid_query_orders_by_distance_and_limits():
+    index = GridIndex([1, 2, 3], [10.0, 10.1, 10.05], [76.0, 76.0, 76.0])
+    results = index.query(10.0, 76.0, 50, limit=2)
+    assert [i for i, _ in results] == [1, 3]
+    assert results[0][1] == pytest.approx(0.0)
+
+def test_empty_index_returns_nothing():
+    assert GridIndex([], [], []).query(10.0, 76.0, 50) == []
+
+def test_upgrade_schema_adds_coordinates_to_old_hospitals_table(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    with engine.begin() as conn:
+        conn.execute(text(
+            "CREATE TABLE hospitals (id INTEGER PRIMARY KEY, name VARCHAR(200), location VARCHAR(200), "
+            "specialties TEXT, rating FLOAT)"
+        ))
+    Base.metadata.create_all(bind=engine)
+
+    upgrade_schema(engine)
+    assert {"latitude", "longitude"} <= {c["name"] for c in inspect(engine).get_columns("hospitals")}
+    engine.dispose()
+
+def test_upgrade_schema_backfills_seed_hospital_coordinates(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    with engine.begin() as conn:
+        conn.execute(text(
+            "CREATE TABLE hospitals (id INTEGER PRIMARY KEY, name VARCHAR(200), location VARCHAR(200), "
+            "specialties TEXT, rating FLOAT)"
+        ))
+        conn.execute(text(
+            "INSERT INTO hospitals (name, location) VALUES "
+            "('Kerala Ayurveda Hospital', 'Kochi, Kerala'), ('Local Clinic', 'Pune')"
+        ))
+    Base.metadata.create_all(bind=engine)
+
+    upgrade_schema(engine)
+    with engine.connect() as conn:
+        rows = dict(conn.execute(text("SELECT name, latitude FROM hospitals")).all())
+    assert rows == {"Kerala Ayurveda Hospital": pytest.approx(9.9312), "Local Clinic": None}
+    engine.dispose()
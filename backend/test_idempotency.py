@@ -0,0 +1,259 @@
+from datetime import timedelta
+from concurrent.futures import ThreadPoolExecutor
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+from sqlalchemy.exc import IntegrityError
+import asyncio
+import httpx
+import time
+import uuid
+import pytest
+
+import database
+import idempotency
+import main
+from auth import create_access_token
+from database import SessionLocal, create_tables, User, Hospital, Slot, Booking, IdempotencyKey
+from idempotency import run_idempotent, purge_expired_keys
+
+@pytest.fixture
+def client():
+    create_tables()
+    # No context manager: startup seeding and background loops stay off
+    return TestClient(main.app)
+
+@pytest.fixture
+def booking_setup(client):
+    """A user with 1000 in their wallet, their auth headers and a free 100 slot."""
+    db = SessionLocal()
+    try:
+        name = f"idem_{uuid.uuid4().hex[:8]}"
+        user = User(username=name, email=f"{name}@example.com", hashed_password="x", wallet_balance=1000.0)
+        hospital = Hospital(name=f"Hospital {name}", location="Kochi")
+        db.add_all([user, hospital])
+        db.flush()
+        slot = Slot(
+            hospital_id=hospital.id, doctor_name="Dr. Menon", specialty="Panchakarma",
+            date="2099-01-01", time="09:00", price=100.0, is_available=True
+        )
+        db.add(slot)
+        db.commit()
+        headers = {"Authorization": f"Bearer {create_access_token({'sub': name})}"}
+        return user.id, slot.id, headers
+    finally:
+        db.close()
+
+def wallet_and_bookings(user_id):
+    db = SessionLocal()
+    try:
+        balance = db.get(User, user_id).wallet_balance
+        return balance, db.query(Booking).filter(Booking.user_id == user_id).count()
+    finally:
+        db.close()
+
+def add_key(key, expires_in, status_code=None, request_hash="x"):
+    db = SessionLocal()
+    try:
+        db.add(IdempotencyKey(
+            key=key, request_hash=request_hash, status_code=status_code,
+            response_body=None if status_code is None else '{"message": "stored"}',
+            expires_at=idempotency._now() + timedelta(seconds=expires_in)
+        ))
+        db.commit()
+    finally:
+        db.close()
+
+def key_row(key):
+    db = SessionLocal()
+    try:
+        return db.get(IdempotencyKey, key)
+    finally:
+        db.close()
+
+def run(key, scope, payload, handler):
+    """run_idempotent on its own session, as an endpoint runs it on the request's."""
+    db = SessionLocal()
+    try:
+        return asyncio.run(run_idempotent(key, scope, payload, handler, db))
+    finally:
+        db.close()
+
+def new_key():
+    return uuid.uuid4().hex
+
+def slow_create_booking(monkeypatch, seconds=0.3):
+    original = main._create_booking
+    def create_booking(*args):
+        time.sleep(seconds)
+        return original(*args)
+    monkeypatch.setattr(main, "_create_booking", create_booking)
+
+def test_retry_replays_the_stored_booking(client, booking_setup):
+    user_id, slot_id, headers = booking_setup
+    headers = {**headers, "Idempotency-Key": new_key()}
+
+    first = client.post("/bookings", json={"slot_id": slot_id}, headers=headers)
+    retry = client.post("/bookings", json={"slot_id": slot_id}, headers=headers)
+
+    assert first.status_code == retry.status_code == 200
+    assert retry.json() == first.json() == {"message": "Booking created successfully", "remaining_balance": 900.0}
+    assert "Idempotent-Replayed" not in first.headers
+    assert retry.headers["Idempotent-Replayed"] == "true"
+    assert wallet_and_bookings(user_id) == (900.0, 1)
+
+def test_key_reused_with_a_different_body_is_rejected(client, booking_setup):
+    _, slot_id, headers = booking_setup
+    headers = {**headers, "Idempotency-Key": new_key()}
+    assert client.post("/bookings", json={"slot_id": slot_id}, headers=headers).status_code == 200
+    assert client.post("/bookings", json={"slot_id": slot_id + 1}, headers=headers).status_code == 422
+
+def test_signup_retry_with_another_password_is_not_replayed(client):
+    name = f"idem_{uuid.uuid4().hex[:8]}"
+    body = {"username": name, "email": f"{name}@example.com", "password": "short", "dosha": "vata"}
+    headers = {"Idempotency-Key": new_key()}
+
+    assert client.post("/auth/signup", json=body, headers=headers).status_code == 400
+    assert client.post("/auth/signup", json={**body, "password": "long enough"}, headers=headers).status_code == 422
+
+    headers = {"Idempotency-Key": new_key()}
+    assert client.post("/auth/signup", json={**body, "password": "long enough"}, headers=headers).status_code == 200
+    assert client.post("/auth/signup", json={**body, "password": "another one"}, headers=headers).status_code == 422
+
+def test_concurrent_duplicates_on_separate_workers_book_once(client, booking_setup, monkeypatch):
+    user_id, slot_id, headers = booking_setup
+    headers = {**headers, "Idempotency-Key": new_key()}
+    slow_create_booking(monkeypatch)
+
+    # Each TestClient call runs on its own event loop, as on separate workers
+    with ThreadPoolExecutor(2) as pool:
+        responses = list(pool.map(
+            lambda _: client.post("/bookings", json={"slot_id": slot_id}, headers=headers), range(2)
+        ))
+
+    assert [r.status_code for r in responses] == [200, 200]
+    assert sorted("Idempotent-Replayed" in r.headers for r in responses) == [False, True]
+    assert wallet_and_bookings(user_id) == (900.0, 1)
+
+def test_concurrent_duplicates_in_one_worker_share_the_result(client, booking_setup, monkeypatch):
+    user_id, slot_id, headers = booking_setup
+    headers = {**headers, "Idempotency-Key": new_key()}
+    slow_create_booking(monkeypatch)
+
+    async def post_twice():
+        async with httpx.AsyncClient(app=main.app, base_url="http://test") as async_client:
+            return await asyncio.gather(*[
+                async_client.post("/bookings", json={"slot_id": slot_id}, headers=headers) for _ in range(2)
+            ])
+
+    responses = asyncio.run(post_twice())
+    assert [r.status_code for r in responses] == [200, 200]
+    assert responses[0].json() == responses[1].json()
+    assert sorted("Idempotent-Replayed" in r.headers for r in responses) == [False, True]
+    assert wallet_and_bookings(user_id) == (900.0, 1)
+
+def test_server_error_releases_the_key(client):
+    key = new_key()
+    calls = []
+
+    def failing():
+        calls.append(1)
+        raise HTTPException(status_code=503, detail="Gateway down")
+
+    for _ in range(2):
+        with pytest.raises(HTTPException):
+            run(key, "test", {"n": 1}, failing)
+        assert key_row(f"test:{key}") is None
+    assert len(calls) == 2
+
+    assert run(key, "test", {"n": 1}, lambda: {"ok": True}) == {"ok": True}
+    assert key_row(f"test:{key}").status_code == 200
+
+def test_response_is_committed_with_the_work(client, booking_setup):
+    user_id, _, _ = booking_setup
+    key = new_key()
+    db = SessionLocal()
+    taken = db.get(User, user_id).username
+    db.close()
+    calls = []
+
+    def handler(db):
+        def add_user():
+            # The duplicate username only fails at commit, after the handler returned
+            calls.append(1)
+            db.add(User(username=taken, email=f"{key}@example.com", hashed_password="x"))
+            return {"ok": True}
+        return add_user
+
+    for _ in range(2):
+        db = SessionLocal()
+        try:
+            with pytest.raises(IntegrityError):
+                asyncio.run(run_idempotent(key, "test", {"n": 1}, handler(db), db))
+        finally:
+            db.close()
+        assert key_row(f"test:{key}") is None
+    assert len(calls) == 2
+
+def test_keyed_booking_holds_one_primary_connection(client, booking_setup):
+    _, slot_id, headers = booking_setup
+    headers = {**headers, "Idempotency-Key": new_key()}
+    checked_out = []
+    most = []
+
+    def checkout(*args):
+        checked_out.append(1)
+        most.append(len(checked_out))
+
+    def checkin(*args):
+        checked_out.pop()
+
+    event.listen(database.engine, "checkout", checkout)
+    event.listen(database.engine, "checkin", checkin)
+    try:
+        assert client.post("/bookings", json={"slot_id": slot_id}, headers=headers).status_code == 200
+    finally:
+        event.remove(database.engine, "checkout", checkout)
+        event.remove(database.engine, "checkin", checkin)
+    assert max(most) == 1
+
+def test_client_error_is_stored_and_replayed(client):
+    key = new_key()
+
+    def rejected():
+        raise HTTPException(status_code=400, detail="Insufficient wallet balance")
+
+    with pytest.raises(HTTPException):
+        run(key, "test", {"n": 1}, rejected)
+    replay = run(key, "test", {"n": 1}, lambda: {"ok": True})
+    assert replay.status_code == 400
+    assert replay.headers["Idempotent-Replayed"] == "true"
+
+def test_key_held_elsewhere_times_out_with_409(client, monkeypatch):
+    monkeypatch.setattr(idempotency, "IDEMPOTENCY_WAIT_SECONDS", 0.3)
+    key = new_key()
+    add_key(f"test:{key}", expires_in=60, request_hash=idempotency._request_hash({"n": 1}))
+
+    with pytest.raises(HTTPException) as error:
+        run(key, "test", {"n": 1}, lambda: {"ok": True})
+    assert error.value.status_code == 409
+
+@pytest.mark.parametrize("status_code", [None, 200])
+def test_expired_or_abandoned_key_is_taken_over(client, status_code):
+    key = new_key()
+    add_key(f"test:{key}", expires_in=-1, status_code=status_code)
+
+    assert run(key, "test", {"n": 2}, lambda: {"ok": True}) == {"ok": True}
+    row = key_row(f"test:{key}")
+    assert row.request_hash == idempotency._request_hash({"n": 2})
+    assert row.status_code == 200
+
+def test_purge_deletes_expired_keys_in_batches(client):
+    prefix = f"purge:{new_key()}"
+    for i in range(5):
+        add_key(f"{prefix}:expired{i}", expires_in=-1)
+    add_key(f"{prefix}:live", expires_in=60)
+
+    assert purge_expired_keys(batch_size=2) >= 5
+    assert all(key_row(f"{prefix}:expired{i}") is None for i in range(5))
+    assert key_row(f"{prefix}:live") is not None
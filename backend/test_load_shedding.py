@@ -0,0 +1,96 @@
+import time
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+import database
+import load_shedding
+import main
+from database import SessionLocal, create_tables
+
+@pytest.fixture
+def client():
+    create_tables()
+    # No context manager: startup seeding and background loops stay off
+    return TestClient(main.app)
+
+def test_route_priorities():
+    assert load_shedding.route_priority("/auth/login") == "high"
+    assert load_shedding.route_priority("/bookings/3/cancel") == "high"
+    assert load_shedding.route_priority("/slots/nearby") == "normal"
+    assert load_shedding.route_priority("/mantras") == "low"
+    assert load_shedding.route_priority("/chatter") == "normal"
+
+def test_busy_worker_sheds_content_before_auth(client, monkeypatch):
+    monkeypatch.setattr(load_shedding, "SHED_MAX_IN_FLIGHT", 10)
+    monkeypatch.setattr(load_shedding, "_in_flight", 6)
+
+    response = client.get("/mantras")
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == str(load_shedding.SHED_RETRY_AFTER_SECONDS)
+    assert client.get("/slots").status_code == 200
+    assert client.post("/auth/login", json={"username": "nobody", "password": "secret"}).status_code == 401
+
+    monkeypatch.setattr(load_shedding, "_in_flight", 10)
+    assert client.post("/auth/login", json={"username": "nobody", "password": "secret"}).status_code == 503
+
+def test_slow_pool_sheds_low_priority_first(client, monkeypatch):
+    wait = load_shedding.SHED_POOL_WAIT_MS / 1000
+    monkeypatch.setattr(load_shedding, "pool_wait_seconds", lambda: wait * 1.5)
+    assert client.get("/recipes").status_code == 503
+    assert client.get("/slots").status_code == 200
+
+    monkeypatch.setattr(load_shedding, "pool_wait_seconds", lambda: wait * 3)
+    assert client.get("/slots").status_code == 503
+    assert client.post("/auth/login", json={"username": "nobody", "password": "secret"}).status_code == 401
+
+def test_pool_wait_average_decays():
+    database._record_pool_wait(1.0)
+    recorded = database.pool_wait_seconds()
+    database._pool_wait[1] -= database.POOL_WAIT_HALF_LIFE_SECONDS
+    assert database.pool_wait_seconds() == pytest.approx(recorded / 2, rel=0.01)
+    database._pool_wait[:] = [0.0, 0.0]
+
+def test_expired_deadline_returns_504(client, monkeypatch):
+    monkeypatch.setitem(load_shedding.DEADLINES, "low", 0.0)
+    checked_out = database.engine.pool.checkedout()
+    for path in ["/diet-plans", "/mantras", "/mantras"]:
+        assert client.get(path).status_code == 504
+    # Sessions that never reached the endpoint still return their connection
+    assert database.engine.pool.checkedout() == checked_out
+
+def test_deadline_interrupts_running_statement():
+    db = SessionLocal()
+    db.info["deadline"] = time.monotonic() + 0.05
+    try:
+        with pytest.raises(OperationalError) as error:
+            db.execute(text(
+                "WITH RECURSIVE n(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM n WHERE x < 100000000) "
+                "SELECT count(*) FROM n"
+            ))
+        assert load_shedding.is_deadline_error(error.value)
+    finally:
+        db.close()
+
+    # The connection goes back to the pool without the deadline
+    db = SessionLocal()
+    try:
+        assert db.execute(text(
+            "WITH RECURSIVE n(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM n WHERE x < 100000) "
+            "SELECT count(*) FROM n"
+        )).scalar() == 100000
+    finally:
+        db.close()
+
+def test_deadline_ends_at_commit():
+    db = SessionLocal()
+    db.info["deadline"] = time.monotonic() + 0.1
+    try:
+        db.execute(text("SELECT 1"))
+        db.commit()
+        time.sleep(0.15)
+        # Reading back committed work must not fail the request
+        assert db.execute(text("SELECT 1")).scalar() == 1
+    finally:
+        db.close()
@@ -0,0 +1,230 @@
+"""SQL query-count and DB-time budgets for every endpoint in main.py.
+
+Each endpoint runs against a seeded local database (see conftest.py) while
+SQLAlchemy engine events count statements and their time. A test fails when
+an endpoint exceeds its budget, or when its statement count changes after the
+data set doubles, which is how N+1 lazy loading shows up.
+
+    QUERY_BUDGET_SEED_SIZE=200 python -m pytest test_query_budget.py
+"""
+
+from datetime import date, datetime, timedelta
+from sqlalchemy import event
+from fastapi.testclient import TestClient
+import json
+import os
+import time
+import pytest
+
+from database import (
+    engine, read_engine, create_tables, SessionLocal, User, Hospital, DoctorSchedule,
+    Slot, Booking, BookingArchive, Mantra, Recipe, DietPlan
+)
+from auth import get_password_hash, create_access_token
+import main
+
+SEED_SIZE = int(os.getenv("QUERY_BUDGET_SEED_SIZE", 20))
+# Total DB time allowed for one request, in milliseconds
+MAX_DB_MS = float(os.getenv("QUERY_BUDGET_MAX_DB_MS", 500))
+
+USERNAME = "budget_user"
+PASSWORD = "budget-password"
+
+class QueryCounter:
+    def __init__(self):
+        self.statements = []
+        self.db_time = 0.0
+        self._started = {}
+
+    def before(self, conn, cursor, statement, parameters, context, executemany):
+        self._started[id(cursor)] = time.perf_counter()
+
+    def after(self, conn, cursor, statement, parameters, context, executemany):
+        self.db_time += time.perf_counter() - self._started.pop(id(cursor), time.perf_counter())
+        # Per-transaction timeouts from load_shedding.py are not queries
+        if not statement.startswith("SET LOCAL statement_timeout"):
+            self.statements.append(statement)
+
+    def __enter__(self):
+        for target in {engine, read_engine or engine}:
+            event.listen(target, "before_cursor_execute", self.before)
+            event.listen(target, "after_cursor_execute", self.after)
+        return self
+
+    def __exit__(self, *exc):
+        for target in {engine, read_engine or engine}:
+            event.remove(target, "before_cursor_execute", self.before)
+            event.remove(target, "after_cursor_execute", self.after)
+
+class FakeModel:
+    """Stands in for Gemini so /chat only exercises our own code."""
+    class Response:
+        text = "Stay warm and eat grounding foods."
+
+    def generate_content(self, prompt):
+        return self.Response()
+
+class Seeder:
+    def __init__(self):
+        self.rounds = 0
+
+    def grow(self, size):
+        """Add `size` more hospitals, schedules, bookings and content items."""
+        db = SessionLocal()
+        try:
+            user = db.query(User).filter(User.username == USERNAME).first()
+            if user is None:
+                user = User(
+                    username=USERNAME, email="budget@example.com",
+                    hashed_password=get_password_hash(PASSWORD), wallet_balance=1e9, dosha="vata"
+                )
+                db.add(user)
+                db.flush()
+
+            self.rounds += 1
+            tag = f"r{self.rounds}"
+            today = date.today()
+            for i in range(size):
+                hospital = Hospital(
+                    name=f"Hospital {tag}-{i}", location="Kochi, Kerala",
+                    latitude=9.93 + (i % 10) * 0.01, longitude=76.26 + (i // 10 % 10) * 0.01,
+                    specialties=json.dumps(["Panchakarma"]), rating=4.5
+                )
+                db.add(hospital)
+                db.flush()
+                schedule = DoctorSchedule(
+                    hospital_id=hospital.id, doctor_name=f"Dr. {tag}-{i}", specialty="Panchakarma",
+                    weekly_pattern=json.dumps({day: ["09:00", "15:00"] for day in ["mon", "wed", "fri", "sat"]}),
+                    price=100.0
+                )
+                db.add(schedule)
+                db.flush()
+                slot_date = (today + timedelta(days=1 + i % 7)).isoformat()
+                booked = Slot(
+                    hospital_id=hospital.id, schedule_id=schedule.id, doctor_name=schedule.doctor_name,
+                    specialty=schedule.specialty, date=slot_date, time=f"{tag}-{i}",
+                    price=100.0, is_available=False
+                )
+                db.add(booked)
+                db.add(Slot(
+                    hospital_id=hospital.id, doctor_name=schedule.doctor_name, specialty=schedule.specialty,
+                    date=slot_date, time="18:00", price=100.0, is_available=True
+                ))
+                db.flush()
+                db.add(Booking(user_id=user.id, slot_id=booked.id))
+                db.add(BookingArchive(
+                    id=10_000_000 + self.rounds * 100_000 + i, user_id=user.id, slot_id=booked.id,
+                    status="confirmed", booking_date=datetime.now() - timedelta(days=30 + i), doctor_name=schedule.doctor_name,
+                    specialty=schedule.specialty, slot_date="2024-01-15", slot_time="09:00",
+                    price=100.0, hospital_name=hospital.name
+                ))
+                db.add(Mantra(title=f"Mantra {tag}-{i}", content="Om", dosha="vata", benefits="Calm", duration="5 minutes"))
+                db.add(Recipe(
+                    title=f"Recipe {tag}-{i}", ingredients="Rice", instructions="Cook", dosha="all",
+                    prep_time="10 minutes", benefits="Grounding"
+                ))
+                db.add(DietPlan(
+                    title=f"Plan {tag}-{i}", description="Warm food", dosha="vata",
+                    meal_plan=json.dumps({"lunch": "Kitchari"}), duration="7 days"
+                ))
+            db.commit()
+        finally:
+            db.close()
+
+@pytest.fixture(scope="module")
+def seeder():
+    create_tables()
+    seeder = Seeder()
+    seeder.grow(SEED_SIZE)
+    return seeder
+
+@pytest.fixture(scope="module")
+def client(seeder, monkeypatch_module):
+    monkeypatch_module.setattr(main, "model", FakeModel())
+    # No context manager: startup seeding and background loops stay off
+    return TestClient(main.app)
+
+@pytest.fixture(scope="module")
+def monkeypatch_module():
+    patcher = pytest.MonkeyPatch()
+    yield patcher
+    patcher.undo()
+
+@pytest.fixture(scope="module")
+def auth_headers(seeder):
+    return {"Authorization": f"Bearer {create_access_token({'sub': USERNAME})}"}
+
+def measure(client, method, path, **kwargs):
+    with QueryCounter() as counter:
+        response = client.request(method, path, **kwargs)
+    assert response.status_code < 500, response.text
+    return response, counter
+
+# Read endpoints: (method, path, needs auth, max statements)
+READ_BUDGETS = {
+    "me": ("GET", "/auth/me", True, 1),
+    "wallet": ("GET", "/wallet", True, 1),
+    "slots": ("GET", "/slots", False, 2),
+    # Includes loading the in-process hospital index on first use
+    "slots_nearby": ("GET", "/slots/nearby?lat=9.95&lon=76.28&radius_km=25", False, 3),
+    "bookings": ("GET", "/bookings", True, 3),
+    "bookings_page": ("GET", "/bookings?limit=10&offset=5", True, 3),
+    "mantras": ("GET", "/mantras?dosha=vata", False, 1),
+    "recipes": ("GET", "/recipes", False, 1),
+    "diet_plans": ("GET", "/diet-plans?dosha=vata", False, 1),
+    "chat": ("POST", "/chat", True, 1),
+}
+
+def _read_kwargs(name, needs_auth, auth_headers):
+    kwargs = {"headers": auth_headers if needs_auth else {}}
+    if name == "chat":
+        kwargs["json"] = {"message": "What should I eat for breakfast?"}
+    return kwargs
+
+@pytest.mark.parametrize("name", sorted(READ_BUDGETS))
+def test_read_endpoint_within_budget(name, client, auth_headers):
+    method, path, needs_auth, budget = READ_BUDGETS[name]
+    response, counter = measure(client, method, path, **_read_kwargs(name, needs_auth, auth_headers))
+    assert response.status_code == 200, response.text
+    assert len(counter.statements) <= budget, counter.statements
+    assert counter.db_time * 1000 <= MAX_DB_MS
+
+def test_statement_count_independent_of_result_size(client, auth_headers, seeder):
+    before = {}
+    for name, (method, path, needs_auth, _) in READ_BUDGETS.items():
+        _, counter = measure(client, method, path, **_read_kwargs(name, needs_auth, auth_headers))
+        before[name] = len(counter.statements)
+
+    seeder.grow(SEED_SIZE)
+
+    for name, (method, path, needs_auth, _) in READ_BUDGETS.items():
+        _, counter = measure(client, method, path, **_read_kwargs(name, needs_auth, auth_headers))
+        assert len(counter.statements) == before[name], f"{name}: {counter.statements}"
+
+def test_signup_and_login_within_budget(client):
+    body = {"username": "budget_signup", "email": "signup@example.com", "password": "secret-pass"}
+    response, counter = measure(client, "POST", "/auth/signup", json=body)
+    assert response.status_code == 200, response.text
+    # Duplicate check, insert
+    assert len(counter.statements) <= 2, counter.statements
+    assert counter.db_time * 1000 <= MAX_DB_MS
+
+    response, counter = measure(client, "POST", "/auth/login", json={"username": "budget_signup", "password": "secret-pass"})
+    assert response.status_code == 200, response.text
+    assert len(counter.statements) <= 2, counter.statements
+
+def test_booking_lifecycle_within_budget(client, auth_headers):
+    slot = next(s for s in client.get("/slots").json() if s["id"] is None)
+    body = {"schedule_id": slot["schedule_id"], "date": slot["date"], "time": slot["time"]}
+    response, counter = measure(client, "POST", "/bookings", json=body, headers=auth_headers)
+    assert response.status_code == 200, response.text
+    # User, existing slot, schedule, slot and booking inserts, wallet update
+    assert len(counter.statements) <= 6, counter.statements
+    assert counter.db_time * 1000 <= MAX_DB_MS
+
+    booking = next(b for b in client.get("/bookings", headers=auth_headers).json() if b["slot"]["time"] == slot["time"])
+    response, counter = measure(client, "PUT", f"/bookings/{booking['id']}/cancel", headers=auth_headers)
+    assert response.status_code == 200, response.text
+    # User, booking, slot, then booking, slot and wallet updates
+    assert len(counter.statements) <= 6, counter.statements
+    assert counter.db_time * 1000 <= MAX_DB_MS
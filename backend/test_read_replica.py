@@ -0,0 +1,122 @@
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from fastapi.testclient import TestClient
+import time
+import uuid
+import pytest
+
+import database
+import main
+from auth import create_access_token
+from database import Base, SessionLocal, create_tables, User, Hospital, Slot, Mantra
+
+REPLICA_TITLE = "Replica Only Mantra"
+
+def replica_sessionmaker(url):
+    engine = create_engine(url, connect_args={"check_same_thread": False})
+    return engine, sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+@pytest.fixture
+def replica(tmp_path, monkeypatch):
+    """A second SQLite file as the read replica, holding one mantra the primary lacks."""
+    engine, Session = replica_sessionmaker(f"sqlite:///{tmp_path / 'replica.db'}")
+    Base.metadata.create_all(bind=engine)
+    db = Session()
+    db.add(Mantra(title=REPLICA_TITLE, content="Om", dosha="all", benefits="Calm", duration="5 minutes"))
+    db.commit()
+    db.close()
+
+    monkeypatch.setattr(database, "read_engine", engine)
+    monkeypatch.setattr(database, "ReadSessionLocal", Session)
+    monkeypatch.setattr(database, "_recent_writes", {})
+    monkeypatch.setattr(database, "_replica_down_until", 0.0)
+    yield Session
+    engine.dispose()
+
+@pytest.fixture
+def client():
+    create_tables()
+    # No context manager: startup seeding and background loops stay off
+    return TestClient(main.app)
+
+@pytest.fixture
+def customer():
+    """Auth headers for a user with money and a free slot to book."""
+    db = SessionLocal()
+    try:
+        name = f"replica_{uuid.uuid4().hex[:8]}"
+        user = User(username=name, email=f"{name}@example.com", hashed_password="x", wallet_balance=1000.0)
+        hospital = Hospital(name=f"Hospital {name}", location="Kochi")
+        db.add_all([user, hospital])
+        db.flush()
+        slot = Slot(
+            hospital_id=hospital.id, doctor_name="Dr. Pillai", specialty="Panchakarma",
+            date="2099-01-01", time="10:00", price=100.0, is_available=True
+        )
+        db.add(slot)
+        db.commit()
+        return {"Authorization": f"Bearer {create_access_token({'sub': name})}"}, slot.id
+    finally:
+        db.close()
+
+def reads_replica(client, headers=None):
+    titles = [m["title"] for m in client.get("/mantras", headers=headers).json()]
+    return REPLICA_TITLE in titles
+
+def test_reads_go_to_the_replica(client, replica, customer):
+    headers, _ = customer
+    assert reads_replica(client)
+    assert reads_replica(client, headers)
+
+def test_client_reads_primary_after_its_own_write(client, replica, customer, monkeypatch):
+    monkeypatch.setattr(database, "READ_STICKY_SECONDS", 0.5)
+    headers, slot_id = customer
+    other_headers = {"Authorization": f"Bearer {create_access_token({'sub': 'someone-else'})}"}
+
+    assert client.post("/bookings", json={"slot_id": slot_id}, headers=headers).status_code == 200
+    assert not reads_replica(client, headers)
+    assert reads_replica(client, other_headers)
+
+    time.sleep(0.55)
+    assert reads_replica(client, headers)
+
+def test_unreachable_replica_falls_back_and_is_skipped(client, replica, tmp_path, monkeypatch):
+    _, broken = replica_sessionmaker(f"sqlite:///{tmp_path / 'missing' / 'replica.db'}")
+    monkeypatch.setattr(database, "ReadSessionLocal", broken)
+
+    assert client.get("/mantras").status_code == 200
+    assert not reads_replica(client)
+    assert database._replica_down_until > time.monotonic()
+
+    # Healthy again, but not tried until READ_RETRY_SECONDS pass
+    monkeypatch.setattr(database, "ReadSessionLocal", replica)
+    assert not reads_replica(client)
+    monkeypatch.setattr(database, "_replica_down_until", time.monotonic() - 1)
+    assert reads_replica(client)
+
+def test_booking_history_holds_one_primary_connection(client, customer, monkeypatch):
+    headers, _ = customer
+    monkeypatch.setattr(database, "ReadSessionLocal", None)
+    checked_out = []
+    most = []
+
+    def checkout(*args):
+        checked_out.append(1)
+        most.append(len(checked_out))
+
+    def checkin(*args):
+        checked_out.pop()
+
+    event.listen(database.engine, "checkout", checkout)
+    event.listen(database.engine, "checkin", checkin)
+    try:
+        assert client.get("/bookings", headers=headers).status_code == 200
+    finally:
+        event.remove(database.engine, "checkout", checkout)
+        event.remove(database.engine, "checkin", checkin)
+    assert max(most) == 1
+
+def test_booking_history_finds_users_the_replica_lacks(client, replica, customer):
+    headers, _ = customer
+    # customer was only written to the primary, as right after signup
+    assert client.get("/bookings", headers=headers).json() == []
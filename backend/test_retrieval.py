@@ -0,0 +1,126 @@
+import asyncio
+import numpy as np
+import pytest
+
+import retrieval
+from database import SessionLocal, create_tables, Recipe
+from retrieval import HashingEmbedder, ContentIndex, build_chat_prompt, get_index, refresh_periodically
+
+ITEMS = [
+    {"key": "mantra:1", "dosha": "vata", "title": "Vata Balancing Mantra",
+     "text": "Mantra: Vata Balancing Mantra. Calms the nervous system, reduces anxiety."},
+    {"key": "recipe:1", "dosha": "all", "title": "Golden Milk",
+     "text": "Recipe: Golden Milk. Improves sleep. Ingredients: almond milk, turmeric, ginger."},
+    {"key": "diet_plan:1", "dosha": "pitta", "title": "Pitta Cooling Diet",
+     "text": "Diet plan: Pitta Cooling Diet (10 days). A cooling diet with cucumber and coconut."},
+]
+
+class CountingEmbedder(HashingEmbedder):
+    def __init__(self):
+        super().__init__(dim=64)
+        self.embedded = 0
+
+    def embed(self, texts):
+        self.embedded += len(texts)
+        return super().embed(texts)
+
+@pytest.fixture
+def index_path(tmp_path):
+    return str(tmp_path / "index.npy")
+
+def test_hashing_embedder_is_deterministic_and_normalised():
+    embedder = HashingEmbedder(dim=128)
+    first = embedder.embed(["turmeric milk for sleep", "what is the"])
+    second = HashingEmbedder(dim=128).embed(["turmeric milk for sleep", "what is the"])
+    np.testing.assert_array_equal(first, second)
+    assert np.isclose(np.linalg.norm(first[0]), 1.0)
+    assert not first[1].any()
+
+def test_search_ranks_relevant_item_first(index_path):
+    index = ContentIndex(index_path, HashingEmbedder())
+    index.sync(ITEMS)
+    (item, score), *_ = index.search("turmeric milk recipe to sleep better", k=2)
+    assert item["key"] == "recipe:1"
+    assert score > 0
+
+def test_search_filters_by_dosha(index_path):
+    index = ContentIndex(index_path, HashingEmbedder())
+    index.sync(ITEMS)
+    keys = {item["key"] for item, _ in index.search("cooling diet", k=3, dosha="vata", min_score=-1.0)}
+    assert keys == {"mantra:1", "recipe:1"}
+
+def test_sync_is_incremental_and_persisted(index_path):
+    embedder = CountingEmbedder()
+    assert ContentIndex(index_path, embedder).sync(ITEMS) == 3
+
+    reopened = ContentIndex(index_path, embedder)
+    assert reopened.count == 3
+    changed = ITEMS[:2] + [dict(ITEMS[2], text="Diet plan: Pitta Cooling Diet. Sweet fruits and rice.")]
+    assert reopened.sync(changed) == 1
+    assert embedder.embedded == 4
+
+    assert reopened.sync(ITEMS[:1]) == 0
+    assert [item["key"] for item, _ in reopened.search("golden milk", k=3, min_score=-1.0)] == ["mantra:1"]
+
+def test_sync_leaves_loaded_generation_unchanged(index_path, tmp_path):
+    ContentIndex(index_path, HashingEmbedder()).sync(ITEMS)
+    live = ContentIndex(index_path, HashingEmbedder())
+    before = live.search("cooling diet cucumber coconut", k=3)
+
+    edited = ITEMS[:2] + [dict(ITEMS[2], text="Diet plan: Pitta Cooling Diet. Sweet fruits and rice.")]
+    refreshed = ContentIndex(index_path, HashingEmbedder())
+    refreshed.sync(edited)
+    refreshed.sync(ITEMS[:2])
+
+    # Vectors still match the metadata the live index loaded with
+    assert live.search("cooling diet cucumber coconut", k=3) == before
+    assert before[0][0]["key"] == "diet_plan:1"
+    assert refreshed.search("cooling diet cucumber coconut", k=3, min_score=-1.0)[0][0]["key"] != "diet_plan:1"
+    # Only the current generation and the one it replaced are kept
+    assert sorted(p.name for p in tmp_path.glob("index.*.npy")) == ["index.2.npy", "index.3.npy"]
+
+def test_search_drops_unrelated_items(index_path):
+    index = ContentIndex(index_path, HashingEmbedder())
+    index.sync(ITEMS)
+    assert index.search("zzz qqq", k=3) == []
+
+def test_index_grows_past_initial_capacity(index_path):
+    index = ContentIndex(index_path, HashingEmbedder(dim=32))
+    items = [{"key": f"recipe:{i}", "dosha": "all", "title": f"Recipe {i}", "text": f"recipe number {i}"} for i in range(150)]
+    index.sync(items)
+    assert ContentIndex(index_path, HashingEmbedder(dim=32)).count == 150
+    assert index.search("recipe number 149", k=1)[0][0]["key"] == "recipe:149"
+
+def test_periodic_refresh_picks_up_new_content(index_path, monkeypatch):
+    monkeypatch.setattr(retrieval, "RETRIEVAL_INDEX_PATH", index_path)
+    monkeypatch.setattr(retrieval, "RETRIEVAL_REFRESH_SECONDS", 0.05)
+    monkeypatch.setattr(retrieval, "_index", None)
+    create_tables()
+    db = SessionLocal()
+    try:
+        recipe = Recipe(
+            title="Saffron Quinoa Porridge", ingredients="quinoa, saffron", instructions="Simmer",
+            dosha="all", prep_time="15 minutes", benefits="Steady morning energy"
+        )
+        db.add(recipe)
+        db.commit()
+        key = f"recipe:{recipe.id}"
+    finally:
+        db.close()
+    assert key not in get_index().rows
+
+    async def run_briefly():
+        task = asyncio.create_task(refresh_periodically())
+        await asyncio.sleep(0.5)
+        task.cancel()
+
+    asyncio.run(run_briefly())
+    (item, _), *_ = get_index().search("saffron quinoa porridge", k=1)
+    assert item["key"] == key
+
+def test_chat_prompt_includes_retrieved_snippets():
+    retrieved = [({"snippet": "Recipe: Golden Milk. Improves sleep."}, 0.8)]
+    prompt = build_chat_prompt("vata", "How can I sleep better?", retrieved)
+    assert "User dosha: vata" in prompt
+    assert "- Recipe: Golden Milk. Improves sleep." in prompt
+    assert prompt.endswith("Question: How can I sleep better?")
@@ -0,0 +1,215 @@
+from datetime import date, datetime, timedelta
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import sessionmaker
+import json
+import pytest
+
+import main
+import schedules
+from auth import create_access_token
+from database import Base, SessionLocal, create_tables, upgrade_schema, User, Hospital, DoctorSchedule, Slot, Booking
+from schedules import SLOT_WINDOW_MAX_DAYS, resolve_window, occurrences, get_slots_for_window, materialize_slot
+from schemas import BookingCreate
+
+# A Monday far enough ahead that every test date is bookable
+MONDAY = date.today() + timedelta(days=14 - date.today().weekday())
+
+def day(offset):
+    return (MONDAY + timedelta(days=offset)).isoformat()
+
+@pytest.fixture
+def Session(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'schedules.db'}")
+    Base.metadata.create_all(bind=engine)
+    yield sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    engine.dispose()
+
+@pytest.fixture
+def db(Session):
+    db = Session()
+    yield db
+    db.close()
+
+@pytest.fixture
+def schedule(db):
+    hospital = Hospital(name="Kerala Ayurveda Center", location="Kochi")
+    db.add(hospital)
+    db.flush()
+    schedule = DoctorSchedule(
+        hospital_id=hospital.id, doctor_name="Dr. Nair", specialty="Panchakarma",
+        weekly_pattern=json.dumps({"mon": ["09:00", "11:00"], "thu": ["14:00"]}), price=100.0
+    )
+    db.add(schedule)
+    db.commit()
+    return schedule
+
+def test_occurrences_follow_weekdays_and_validity(schedule):
+    assert list(occurrences(schedule, MONDAY, MONDAY + timedelta(days=6))) == [
+        (day(0), "09:00"), (day(0), "11:00"), (day(3), "14:00")
+    ]
+    schedule.valid_from = day(1)
+    schedule.valid_until = day(7)
+    assert list(occurrences(schedule, MONDAY, MONDAY + timedelta(days=13))) == [
+        (day(3), "14:00"), (day(7), "09:00"), (day(7), "11:00")
+    ]
+
+def test_resolve_window():
+    assert resolve_window(day(0), day(6)) == (MONDAY, MONDAY + timedelta(days=6))
+    start, end = resolve_window()
+    assert start == date.today() and end > start
+    with pytest.raises(ValueError):
+        resolve_window(day(6), day(0))
+    with pytest.raises(ValueError):
+        resolve_window(day(0), day(SLOT_WINDOW_MAX_DAYS))
+
+def test_slots_endpoint_rejects_bad_windows():
+    create_tables()
+    client = TestClient(main.app)
+    assert client.get("/slots", params={"start_date": day(6), "end_date": day(0)}).status_code == 400
+    assert client.get("/slots", params={"start_date": day(0), "end_date": day(SLOT_WINDOW_MAX_DAYS)}).status_code == 400
+
+def test_generated_slot_from_listing_can_be_booked():
+    """The slots page books generated slots (id null) by schedule, date and time."""
+    create_tables()
+    db = SessionLocal()
+    try:
+        user = User(username="listing_booker", email="listing_booker@example.com", hashed_password="x", wallet_balance=1000.0)
+        hospital = Hospital(name="Listing Test Hospital", location="Kochi")
+        db.add_all([user, hospital])
+        db.flush()
+        db.add(DoctorSchedule(
+            hospital_id=hospital.id, doctor_name="Dr. Listing", specialty="Panchakarma",
+            weekly_pattern=json.dumps({"mon": ["09:00"]}), price=100.0
+        ))
+        db.commit()
+    finally:
+        db.close()
+
+    client = TestClient(main.app)
+    listed = client.get("/slots", params={"start_date": day(0), "end_date": day(6)}).json()
+    slot = next(s for s in listed if s["doctor_name"] == "Dr. Listing")
+    assert slot["id"] is None
+    body = {"schedule_id": slot["schedule_id"], "date": slot["date"], "time": slot["time"]}
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': 'listing_booker'})}"}
+    assert client.post("/bookings", json=body, headers=headers).status_code == 200
+    listed = client.get("/slots", params={"start_date": day(0), "end_date": day(6)}).json()
+    assert not any(s["doctor_name"] == "Dr. Listing" for s in listed)
+
+def test_persisted_slots_override_generated_ones(db, schedule):
+    booked = Slot(
+        hospital_id=schedule.hospital_id, schedule_id=schedule.id, doctor_name="Dr. Nair",
+        specialty="Panchakarma", date=day(0), time="09:00", price=100.0, is_available=False
+    )
+    repriced = Slot(
+        hospital_id=schedule.hospital_id, schedule_id=schedule.id, doctor_name="Dr. Nair",
+        specialty="Panchakarma", date=day(0), time="11:00", price=150.0, is_available=True
+    )
+    db.add_all([booked, repriced])
+    db.commit()
+
+    slots = get_slots_for_window(db, MONDAY, MONDAY + timedelta(days=6))
+    assert [(s["id"], s["date"], s["time"], s["price"]) for s in slots] == [
+        (repriced.id, day(0), "11:00", 150.0), (None, day(3), "14:00", 100.0)
+    ]
+
+def test_past_occurrences_are_not_listed(db, schedule):
+    past = date.today() - timedelta(days=7)
+    assert all(s["date"] >= date.today().isoformat() for s in get_slots_for_window(db, past, date.today()))
+
+def test_slots_that_started_today_are_not_offered(db, schedule, monkeypatch):
+    monkeypatch.setattr(schedules, "_now", lambda: datetime.combine(MONDAY, datetime.min.time()).replace(hour=10))
+    assert [(s["date"], s["time"]) for s in get_slots_for_window(db, MONDAY, MONDAY)] == [(day(0), "11:00")]
+    assert materialize_slot(db, schedule.id, day(0), "09:00") is None
+    assert materialize_slot(db, schedule.id, day(0), "11:00") is not None
+
+@pytest.mark.parametrize("slot_date, slot_time", [
+    (day(1), "09:00"),                                           # not a schedule weekday
+    (day(0), "10:00"),                                           # not a schedule time
+    ((date.today() - timedelta(days=7 + date.today().weekday())).isoformat(), "09:00"),  # past Monday
+    ("next monday", "09:00"),
+])
+def test_materialize_rejects_occurrences_not_offered(db, schedule, slot_date, slot_time):
+    assert materialize_slot(db, schedule.id, slot_date, slot_time) is None
+
+def test_materialize_rejects_inactive_schedules(db, schedule):
+    schedule.is_active = False
+    db.commit()
+    assert materialize_slot(db, schedule.id, day(0), "09:00") is None
+
+def test_materialize_reuses_the_persisted_slot(db, schedule):
+    slot = materialize_slot(db, schedule.id, day(0), "09:00")
+    db.commit()
+    assert materialize_slot(db, schedule.id, day(0), "09:00").id == slot.id
+
+def test_concurrent_booking_of_one_occurrence_gets_404(Session, schedule, monkeypatch):
+    setup = Session()
+    setup.add_all([
+        User(username=name, email=f"{name}@example.com", hashed_password="x", wallet_balance=1000.0)
+        for name in ["first", "second"]
+    ])
+    setup.commit()
+    setup.close()
+    booking = BookingCreate(schedule_id=schedule.id, date=day(0), time="09:00")
+    first_db, second_db = Session(), Session()
+    first = first_db.query(User).filter(User.username == "first").one()
+    second = second_db.query(User).filter(User.username == "second").one()
+
+    def racing_materialize(db, *args):
+        slot = materialize_slot(db, *args)
+        if db is second_db:
+            # The other request persists the same occurrence before this one commits
+            main._create_booking(booking, first, first_db)
+            first_db.commit()
+        return slot
+
+    monkeypatch.setattr(main, "materialize_slot", racing_materialize)
+    try:
+        with pytest.raises(HTTPException) as error:
+            main._create_booking(booking, second, second_db)
+        assert error.value.status_code == 404
+
+        check = Session()
+        assert check.query(Booking).count() == 1
+        assert check.query(User.wallet_balance).filter(User.username == "second").scalar() == 1000.0
+        check.close()
+    finally:
+        first_db.close()
+        second_db.close()
+
+def test_unique_constraint_rejects_duplicate_occurrences(Session, schedule):
+    first, second = Session(), Session()
+    try:
+        first_slot = materialize_slot(first, schedule.id, day(0), "09:00")
+        second_slot = materialize_slot(second, schedule.id, day(0), "09:00")
+        assert first_slot is not None and second_slot is not None
+        first.commit()
+        with pytest.raises(IntegrityError):
+            second.commit()
+    finally:
+        first.close()
+        second.close()
+
+def test_upgrade_schema_adds_schedule_columns_to_old_tables(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    with engine.begin() as conn:
+        # slots as created before doctor schedules existed
+        conn.execute(text(
+            "CREATE TABLE slots (id INTEGER PRIMARY KEY, hospital_id INTEGER, doctor_name VARCHAR(100), "
+            "specialty VARCHAR(100), date VARCHAR(20), time VARCHAR(10), price FLOAT, is_available BOOLEAN)"
+        ))
+        conn.execute(text("INSERT INTO slots (date, time) VALUES ('2024-01-15', '09:00')"))
+    Base.metadata.create_all(bind=engine)
+
+    upgrade_schema(engine)
+    upgrade_schema(engine)
+
+    assert "schedule_id" in {c["name"] for c in inspect(engine).get_columns("slots")}
+    indexes = {i["name"]: i for i in inspect(engine).get_indexes("slots")}
+    assert indexes["uq_slots_schedule_occurrence"]["unique"]
+    assert "ix_slots_date" in indexes
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT count(*) FROM slots WHERE schedule_id IS NULL")).scalar() == 1
+    engine.dispose()
@@ -10,20 +10,33 @@ import Button from '../components/ui/Button'
 import { PageLoader, InlineLoader } from '../components/ui/LoadingSpinner'
 
 interface Slot {
-  id: number
-  hospital_name: string
+  // null for slots generated from a doctor's schedule that nobody has booked yet
+  id: number | null
+  schedule_id: number | null
+  hospital_id: number
+  hospital: { id: number; name: string; location: string; rating: number }
   doctor_name: string
-  specialization: string
+  specialty: string
   date: string
   time: string
   price: number
-  available: boolean
+  is_available: boolean
 }
 
+// Stable identity for persisted and generated slots alike
+const slotKey = (slot: Slot) =>
+  slot.id !== null ? `slot-${slot.id}` : `schedule-${slot.schedule_id}-${slot.date}-${slot.time}`
+
+// Generated slots are booked by schedule occurrence, persisted ones by id
+const bookingBody = (slot: Slot) =>
+  slot.id !== null
+    ? { slot_id: slot.id }
+    : { schedule_id: slot.schedule_id, date: slot.date, time: slot.time }
+
 export default function Slots() {
   const [slots, setSlots] = useState<Slot[]>([])
   const [loading, setLoading] = useState(true)
-  const [bookingSlot, setBookingSlot] = useState<number | null>(null)
+  const [bookingSlot, setBookingSlot] = useState<string | null>(null)
   const [filter, setFilter] = useState('all')
   const { user } = useAuth()
   const { showToast } = useToast()
@@ -56,10 +69,10 @@ export default function Slots() {
     }
   }
 
-  const bookSlot = async (slotId: number, price: number) => {
+  const bookSlot = async (slot: Slot) => {
     if (!user) return
 
-    if (user.wallet_balance < price) {
+    if (user.wallet_balance < slot.price) {
       showToast({
         type: 'warning',
         title: 'Insufficient Balance',
@@ -68,7 +81,7 @@ export default function Slots() {
       return
     }
 
-    setBookingSlot(slotId)
+    setBookingSlot(slotKey(slot))
     try {
       const token = document.cookie.split('; ').find(row => row.startsWith('token='))?.split('=')[1]
       const response = await fetch(`${process.env.NEXT_PUBLIC_API_URL}/bookings`, {
@@ -77,7 +90,7 @@ export default function Slots() {
           'Content-Type': 'application/json',
           'Authorization': `Bearer ${token}`
         },
-        body: JSON.stringify({ slot_id: slotId })
+        body: JSON.stringify(bookingBody(slot))
       })
 
       if (response.ok) {
@@ -108,13 +121,13 @@ export default function Slots() {
   }
 
   const filteredSlots = slots.filter(slot => {
-    if (filter === 'all') return slot.available
-    if (filter === 'affordable') return slot.available && user && slot.price <= user.wallet_balance
+    if (filter === 'all') return slot.is_available
+    if (filter === 'affordable') return slot.is_available && user && slot.price <= user.wallet_balance
     if (filter === 'today') {
       const today = new Date().toISOString().split('T')[0]
-      return slot.available && slot.date === today
+      return slot.is_available && slot.date === today
     }
-    return slot.available
+    return slot.is_available
   })
 
   if (!user) {
@@ -231,7 +244,7 @@ export default function Slots() {
         <div className="grid gap-6 md:grid-cols-2 lg:grid-cols-3">
           {filteredSlots.map((slot, index) => (
             <div 
-              key={slot.id} 
+              key={slotKey(slot)} 
               className="card-hover bg-white/90 backdrop-blur-sm border border-saffron-100 rounded-3xl p-6 shadow-xl animate-fade-in-up hover:shadow-2xl hover:border-saffron-200"
               style={{ animationDelay: `${index * 0.1}s` }}
             >
@@ -242,7 +255,7 @@ export default function Slots() {
                     <span className="text-white text-xl">🏥</span>
                   </div>
                   <div>
-                    <h3 className="text-lg font-bold text-gray-900">{slot.hospital_name}</h3>
+                    <h3 className="text-lg font-bold text-gray-900">{slot.hospital.name}</h3>
                     <p className="text-sm text-gray-600">Certified Ayurveda Center</p>
                   </div>
                 </div>
@@ -266,7 +279,7 @@ export default function Slots() {
                     <span className="mr-2">🎯</span>
                     Specialty:
                   </span>
-                  <span className="font-semibold text-gray-900">{slot.specialization}</span>
+                  <span className="font-semibold text-gray-900">{slot.specialty}</span>
                 </div>
                 <div className="flex items-center justify-between">
                   <span className="flex items-center text-gray-600">
@@ -291,17 +304,17 @@ export default function Slots() {
                   <p className="text-2xl font-bold text-saffron-600">₹{slot.price}</p>
                 </div>
                 <button
-                  onClick={() => bookSlot(slot.id, slot.price)}
-                  disabled={bookingSlot === slot.id || user.wallet_balance < slot.price}
+                  onClick={() => bookSlot(slot)}
+                  disabled={bookingSlot === slotKey(slot) || user.wallet_balance < slot.price}
                   className={`px-6 py-3 rounded-full font-semibold transition-all duration-300 ${
                     user.wallet_balance < slot.price
                       ? 'bg-gray-200 text-gray-500 cursor-not-allowed'
-                      : bookingSlot === slot.id
+                      : bookingSlot === slotKey(slot)
                       ? 'bg-saffron-400 text-white cursor-not-allowed'
                       : 'bg-saffron-600 hover:bg-saffron-700 text-white shadow-lg hover:shadow-xl transform hover:scale-105'
                   }`}
                 >
-                  {bookingSlot === slot.id ? (
+                  {bookingSlot === slotKey(slot) ? (
                     <div className="flex items-center space-x-2">
                       <InlineLoader size="sm" />
                       <span>Booking...</span>